@@ -1,20 +1,304 @@
 # Created by: José Hurtarte
 # Created on: 25/02/2023
-# Last modified on: 26/02/2023
+# Last modified on: 15/03/2023
 # Description: Automata module and class
 
 
-from graphviz import Digraph
-import copy
+from array import array
+import json
+import struct
+
+from CharClass import CharSet, label_key, label_to_json, label_from_json
+
+EPSILON = 'ε'
+EMPTY_STATES = frozenset()
+AUTOMATA_MAGIC = b'LXN2'
+# data written before the final rules were stored, still read as automata without rules
+AUTOMATA_MAGIC_V1 = b'LXN1'
+AUTOMATA_HEADER = '<4sIiIII'
 
 class Automata:
     def __init__(self, states, alphabet, transitions, initial_state, final_states):
         self.states = states
         self.alphabet = alphabet
-        self.transitions = transitions
         self.initial_state = initial_state
         self.final_states = final_states
-    
+        # adjacency index: state -> symbol -> set of next states, ε-edges are kept apart
+        self.delta = {}
+        self.epsilon = {}
+        # labels of the symbol edges, single characters or CharSets, a character follows the edges of every
+        # label containing it. Characters inside the same labels form a symbol class and behave the same
+        self.labels = set()
+        self.char_sets = []
+        # character -> its symbol class, the tuple of labels containing it, dropped whenever a label is added
+        self.symbol_classes = {}
+        # memoized ε-closure of every state, dropped whenever the transitions change
+        self.closures = {}
+        # final state -> id of the token rule accepted there, only used by combined tokenizer automata
+        self.final_rules = {}
+        # state id allocator used while the automata is being built
+        self.next_state_id = max(states)+1 if states else 0
+        for (state, symbol), next_state in transitions:
+            self.add_transition(state, symbol, next_state)
+
+    def new_state(self):
+        state = self.next_state_id
+        self.next_state_id += 1
+        self.states.append(state)
+        return state
+
+    def add_transition(self, state, symbol, next_state):
+        if self.closures:
+            self.closures.clear()
+        if symbol == EPSILON:
+            self.epsilon.setdefault(state, set()).add(next_state)
+        else:
+            if symbol not in self.labels:
+                self.add_label(symbol)
+            self.delta.setdefault(state, {}).setdefault(symbol, set()).add(next_state)
+
+    def add_label(self, symbol):
+        self.labels.add(symbol)
+        if isinstance(symbol, CharSet):
+            self.char_sets.append(symbol)
+        self.symbol_classes.clear()
+
+    def symbol_class(self, character):
+        symbol_class = self.symbol_classes.get(character)
+        if symbol_class is None:
+            labels = [character] if character in self.labels else []
+            labels.extend(char_set for char_set in self.char_sets if character in char_set)
+            symbol_class = tuple(labels)
+            self.symbol_classes[character] = symbol_class
+        return symbol_class
+
+    def remove_transition(self, state, symbol, next_state):
+        if self.closures:
+            self.closures.clear()
+        if symbol == EPSILON:
+            targets = self.epsilon.get(state)
+            if targets is not None:
+                targets.discard(next_state)
+                if not targets:
+                    del self.epsilon[state]
+            return
+        edges = self.delta.get(state)
+        if edges is not None and symbol in edges:
+            edges[symbol].discard(next_state)
+            if not edges[symbol]:
+                del edges[symbol]
+            if not edges:
+                del self.delta[state]
+
+    def next_states(self, state, symbol):
+        if symbol == EPSILON:
+            return self.epsilon.get(state, EMPTY_STATES)
+        return self.delta.get(state, {}).get(symbol, EMPTY_STATES)
+
+    def epsilon_states(self, state):
+        return self.epsilon.get(state, EMPTY_STATES)
+
+    def edges(self, state):
+        # yields (symbol, next_state) for every edge leaving state, ε-edges included
+        for symbol, next_states in self.delta.get(state, {}).items():
+            for next_state in next_states:
+                yield symbol, next_state
+        for next_state in self.epsilon.get(state, EMPTY_STATES):
+            yield EPSILON, next_state
+
+    def merge_transitions(self, automata):
+        if self.closures:
+            self.closures.clear()
+        for state, edges in automata.delta.items():
+            own_edges = self.delta.setdefault(state, {})
+            for symbol, next_states in edges.items():
+                if symbol not in self.labels:
+                    self.add_label(symbol)
+                own_edges.setdefault(symbol, set()).update(next_states)
+        for state, next_states in automata.epsilon.items():
+            self.epsilon.setdefault(state, set()).update(next_states)
+
+    def transition_count(self):
+        return sum(len(next_states) for edges in self.delta.values() for next_states in edges.values()) + \
+            sum(len(next_states) for next_states in self.epsilon.values())
+
+    # flat ((state, symbol), next_state) view, kept for compatibility with the old list format
+    @property
+    def transitions(self):
+        return self.export_transitions()
+
+    @transitions.setter
+    def transitions(self, transitions):
+        self.delta = {}
+        self.epsilon = {}
+        self.closures = {}
+        self.labels = set()
+        self.char_sets = []
+        self.symbol_classes = {}
+        for (state, symbol), next_state in transitions:
+            self.add_transition(state, symbol, next_state)
+
+    def export_transitions(self):
+        transitions = []
+        for state, edges in self.delta.items():
+            for symbol, next_states in edges.items():
+                transitions.extend(((state, symbol), next_state) for next_state in next_states)
+        for state, next_states in self.epsilon.items():
+            transitions.extend(((state, EPSILON), next_state) for next_state in next_states)
+        return transitions
+
+    # compact binary format: a fixed header, the alphabet as json (CharSets as lists of ranges) and the states, final states and
+    # (state, symbol index, next state) transition triplets as int32 arrays, ε has the symbol index -1.
+    # Ends with the (final state, rule id) pairs of final_rules, so tokenizer automata keep their rules
+    def to_bytes(self):
+        symbols = sorted((symbol for symbol in self.alphabet if symbol != EPSILON), key=label_key)
+        symbol_ids = {symbol: symbol_id for symbol_id, symbol in enumerate(symbols)}
+        alphabet = [label_to_json(symbol) for symbol in sorted(self.alphabet, key=label_key)]
+        encoded_alphabet = json.dumps(alphabet, ensure_ascii=False).encode('utf-8')
+        transitions = array('i')
+        for state, edges in self.delta.items():
+            for symbol, next_states in edges.items():
+                for next_state in next_states:
+                    transitions.extend((state, symbol_ids[symbol], next_state))
+        for state, next_states in self.epsilon.items():
+            for next_state in next_states:
+                transitions.extend((state, -1, next_state))
+        final_rules = array('i')
+        for state, rule in sorted(self.final_rules.items()):
+            final_rules.extend((state, rule))
+        header = struct.pack(AUTOMATA_HEADER, AUTOMATA_MAGIC, len(self.states), self.initial_state,
+                             len(self.final_states), len(transitions) // 3, len(encoded_alphabet))
+        return header + encoded_alphabet + array('i', self.states).tobytes() + \
+            array('i', self.final_states).tobytes() + transitions.tobytes() + \
+            struct.pack('<I', len(final_rules) // 2) + final_rules.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, state_count, initial_state, final_count, transition_count, alphabet_size = \
+            struct.unpack_from(AUTOMATA_HEADER, data)
+        if magic not in (AUTOMATA_MAGIC, AUTOMATA_MAGIC_V1):
+            raise ValueError('Invalid compiled automata data')
+        offset = struct.calcsize(AUTOMATA_HEADER)
+        alphabet = {label_from_json(symbol) for symbol in json.loads(bytes(data[offset:offset + alphabet_size]).decode('utf-8'))}
+        offset += alphabet_size
+        arrays = []
+        for size in (state_count, final_count, transition_count * 3):
+            values = array('i')
+            values.frombytes(data[offset:offset + size * values.itemsize])
+            offset += size * values.itemsize
+            arrays.append(values)
+        states, final_states, transitions = arrays
+        symbols = sorted((symbol for symbol in alphabet if symbol != EPSILON), key=label_key)
+        automata = cls(states.tolist(), alphabet, [], initial_state, final_states.tolist())
+        for i in range(0, len(transitions), 3):
+            symbol_id = transitions[i + 1]
+            automata.add_transition(transitions[i], symbols[symbol_id] if symbol_id >= 0 else EPSILON, transitions[i + 2])
+        if magic == AUTOMATA_MAGIC:
+            rule_count, = struct.unpack_from('<I', data, offset)
+            offset += struct.calcsize('<I')
+            final_rules = array('i')
+            final_rules.frombytes(data[offset:offset + 2 * rule_count * final_rules.itemsize])
+            automata.final_rules = dict(zip(final_rules[::2], final_rules[1::2]))
+        return automata
+
+    def epsilon_closure(self, state):
+        closure = self.closures.get(state)
+        if closure is None:
+            reached = {state}
+            pending = [state]
+            while pending:
+                for next_state in self.epsilon.get(pending.pop(), EMPTY_STATES):
+                    if next_state not in reached:
+                        reached.add(next_state)
+                        pending.append(next_state)
+            closure = frozenset(reached)
+            self.closures[state] = closure
+        return closure
+
+    def closure_of(self, states):
+        closure = set()
+        for state in states:
+            closure.update(self.epsilon_closure(state))
+        return frozenset(closure)
+
+    # set of states reached from states by consuming the character symbol, ε-closure included
+    def step(self, states, symbol):
+        if self.char_sets:
+            return self.step_class(states, self.symbol_class(symbol))
+        # without character sets a character only follows its own edges
+        reached = set()
+        for state in states:
+            for next_state in self.delta.get(state, {}).get(symbol, EMPTY_STATES):
+                reached.update(self.epsilon_closure(next_state))
+        return frozenset(reached)
+
+    # same step for every character of a symbol class at once
+    def step_class(self, states, symbol_class):
+        reached = set()
+        for state in states:
+            edges = self.delta.get(state)
+            if edges:
+                for label in symbol_class:
+                    for next_state in edges.get(label, EMPTY_STATES):
+                        reached.update(self.epsilon_closure(next_state))
+        return frozenset(reached)
+
+    # Thompson simulation: every input character is read once, no backtracking
+    # returns the end of the longest match starting at pos, None if nothing matches
+    def match(self, text, pos=0):
+        final_states = frozenset(self.final_states)
+        states = self.epsilon_closure(self.initial_state)
+        last_end = None
+        for i in range(pos, len(text)):
+            if not final_states.isdisjoint(states):
+                last_end = i
+            states = self.step(states, text[i])
+            if not states:
+                return last_end
+        if not final_states.isdisjoint(states):
+            last_end = len(text)
+        return last_end
+
+    def fullmatch(self, text):
+        final_states = frozenset(self.final_states)
+        states = self.epsilon_closure(self.initial_state)
+        for character in text:
+            states = self.step(states, character)
+            if not states:
+                return False
+        return not final_states.isdisjoint(states)
+
+    # leftmost-longest search, returns (start, end) of the match or None
+    # all start positions are simulated together, each state remembers the earliest start that reached it
+    def search(self, text, pos=0):
+        final_states = frozenset(self.final_states)
+        initial_closure = self.epsilon_closure(self.initial_state)
+        threads = {}
+        best = None
+        for i in range(pos, len(text) + 1):
+            if best is None:
+                for state in initial_closure:
+                    threads.setdefault(state, i)
+            # threads keep insertion order, so starts are non decreasing
+            for state, start in threads.items():
+                if state in final_states:
+                    if best is None or start <= best[0]:
+                        best = (start, i)
+                    break
+            if best is not None:
+                threads = {state: start for state, start in threads.items() if start <= best[0]}
+            if i == len(text) or (not threads and best is not None):
+                break
+            next_threads = {}
+            symbol_class = self.symbol_class(text[i])
+            for state, start in threads.items():
+                edges = self.delta.get(state, {})
+                for label in symbol_class:
+                    for next_state in edges.get(label, EMPTY_STATES):
+                        for closure_state in self.epsilon_closure(next_state):
+                            next_threads.setdefault(closure_state, start)
+            threads = next_threads
+        return best
 
 def embellish_automata(automata):
     state_map = {prev_state: new_state for new_state, prev_state in enumerate(automata.states)}
@@ -24,150 +308,123 @@ def embellish_automata(automata):
     final_states = [state_map[state] for state in automata.final_states]
     initial_state_map = {initial_state: 0, 0: initial_state}
     final_state_map = {final_states[i-1]:len(states)-i for i in range(1, len(final_states)+1)}
-    transitions = []
-    for transition in automata.transitions:
-        new_transition = ((state_map[transition[0][0]], transition[0][1]), state_map[transition[1]])
-        if new_transition[0][0] in initial_state_map:
-            new_transition = ((initial_state_map[new_transition[0][0]], new_transition[0][1]), new_transition[1])
-        if new_transition[1] in initial_state_map:
-            new_transition = (new_transition[0], initial_state_map[new_transition[1]])
-        if new_transition[0][0] in final_state_map:
-            new_transition = ((final_state_map[new_transition[0][0]], new_transition[0][1]), new_transition[1])
-        if new_transition[1] in final_state_map:
-            new_transition = (new_transition[0], final_state_map[new_transition[1]])
-        transitions.append(new_transition)
-    initial_state = initial_state_map[initial_state]
-    return Automata(states, automata.alphabet, transitions, initial_state, final_states)
-
-def draw_automata(automata):
-    f = Digraph('finite_state_machine', format='png')
-    f.attr(rankdir='LR')
-    f.attr('node', shape='circle') #makes all nodes circles
-    # inner_nodes is equal to all the nodes that are not the initial state or the final states
-    inner_nodes = [state for state in automata.states if state not in automata.final_states and state != automata.initial_state]
-    f.node('start_mark', shape='point', style='invis')
-    f.node(str(automata.initial_state))
-    f.edge('start_mark', str(automata.initial_state))
-    for operand in automata.alphabet:
-        next_states = [transition[1] for transition in automata.transitions if transition[0] == (automata.initial_state, operand)]
-        for next_state in next_states:
-            f.edge(str(automata.initial_state), str(next_state), label=operand)
-    for state in inner_nodes:
-        f.node(str(state))
-        for operand in automata.alphabet:
-            next_states = [transition[1] for transition in automata.transitions if transition[0] == (state, operand)]
-            for next_state in next_states:
-                f.edge(str(state), str(next_state), label=operand)
-    for state in automata.final_states:
-        f.node(str(state), shape='doublecircle')
-    f.render('NFA', format='png')
-    
+    # every state is renamed once, then edges are copied straight from the index
+    rename = {}
+    for prev_state, new_state in state_map.items():
+        new_state = initial_state_map.get(new_state, new_state)
+        rename[prev_state] = final_state_map.get(new_state, new_state)
+    embellished = Automata(states, automata.alphabet, [], initial_state_map[initial_state], final_states)
+    for state in automata.states:
+        for symbol, next_state in automata.edges(state):
+            embellished.add_transition(rename[state], symbol, rename[next_state])
+    return embellished
+
+# renders the automata to path (and path.png), graphviz is only imported when a picture is actually drawn
+def draw_automata(automata, path='NFA'):
+    from Export import RenderQueue
+    queue = RenderQueue()
+    queue.add_automata(automata, path)
+    return queue.render()[0]
+
+class Fragment:
+    # piece of the automata under construction: its initial state and the dangling (state, symbol) edges
+    # that lead to its final state, the final state is only created once nothing else is appended after it
+    def __init__(self, initial_state, dangling_edges):
+        self.initial_state = initial_state
+        self.dangling_edges = dangling_edges
 
-def operand_automata(subexpression, current_state):
-    states = [current_state, current_state+1]
-    alphabet = {subexpression}
-    initial_state = current_state
-    final_states = [current_state+1]
-    transitions = [((current_state, subexpression), current_state+1)]
-    return Automata(states, alphabet, transitions, initial_state, final_states)
-
-def or_automata(right_automata, left_automata, current_state):
-    # union of the states of the two automata
-    states = left_automata.states + right_automata.states
-    states.extend([current_state, current_state+1])
-    initial_state = current_state
-    final_states = [current_state+1]
-    # union of the alphabet of the two automata
-    alphabet = left_automata.alphabet.union(right_automata.alphabet)
-    alphabet.add('ε')
-    # union of the transitions of the two automata
-    transitions = left_automata.transitions + right_automata.transitions
+# points every dangling edge of the fragment to state, each edge is patched exactly once
+def patch_fragment(automata, fragment, state):
+    for dangling_state, symbol in fragment.dangling_edges:
+        automata.add_transition(dangling_state, symbol, state)
+
+# gives the fragment a real final state, returns it
+def close_fragment(automata, fragment):
+    final_state = automata.new_state()
+    patch_fragment(automata, fragment, final_state)
+    return final_state
+
+def operand_automata(automata, subexpression):
+    initial_state = automata.new_state()
+    automata.alphabet.add(subexpression)
+    return Fragment(initial_state, [(initial_state, subexpression)])
+
+def or_automata(automata, right_fragment, left_fragment):
+    initial_state = automata.new_state()
+    automata.alphabet.add('ε')
     # add transitions to the new initial state
-    transitions.append(((current_state, 'ε'), left_automata.initial_state))
-    transitions.append(((current_state, 'ε'), right_automata.initial_state))
-    # add transitions from the final states of the two automata to the new final state
-    for state in left_automata.final_states:
-        transitions.append(((state, 'ε'), current_state+1))
-    for state in right_automata.final_states:
-        transitions.append(((state, 'ε'), current_state+1))
-    return Automata(states, alphabet, transitions, initial_state, final_states)
-
-def concatenation_automata(right_automata, left_automata):
-    # union of the states of the two automata
-    states = [x for x in left_automata.states if x not in left_automata.final_states] + right_automata.states
-
-    initial_state = left_automata.initial_state
-    final_states = right_automata.final_states
-    alphabet = left_automata.alphabet.union(right_automata.alphabet)
-    transitions = left_automata.transitions + right_automata.transitions
-
-    for i in range(len(transitions)):
-        if transitions[i][1] in left_automata.final_states:
-            transitions[i] = ((transitions[i][0][0], transitions[i][0][1]), right_automata.initial_state)
-    return Automata(states, alphabet, transitions, initial_state, final_states)
-
-def kleene_automata(automata, current_state):
-    states = automata.states
-    states.extend([current_state, current_state+1])
-    initial_state = current_state
-    final_states = [current_state+1]
-    alphabet = automata.alphabet
-    alphabet.add('ε')
-    transitions = automata.transitions
-    # transition the final states of the automata to the initial state
-    for state in automata.final_states:
-        transitions.append(((state, 'ε'), automata.initial_state))
-    # transition from the initial state to the initial state of the automata
-    transitions.append(((current_state, 'ε'), automata.initial_state))
-    # transition from the final states of the automata to the final state
-    for state in automata.final_states:
-        transitions.append(((state, 'ε'), current_state+1))
-    # transition from the initial state to the final state
-    transitions.append(((current_state, 'ε'), current_state+1))
-    return Automata(states, alphabet, transitions, initial_state, final_states)
-
-def question_automata(automata, current_state):
-    epsilon_automata = operand_automata('ε', current_state)
-    return or_automata(epsilon_automata, automata, current_state+2)
-
-def automata_state_change(automata):
-    automata_copy = copy.deepcopy(automata)
-    state_offset = max(automata.states)+1
-    automata_copy.states = [state + state_offset for state in automata_copy.states]
-    automata_copy.initial_state += state_offset
-    automata_copy.final_states = [state + state_offset for state in automata_copy.final_states]
-    automata_copy.transitions = [((transition[0][0] + state_offset, transition[0][1]), transition[1] + state_offset) for transition in automata_copy.transitions]
-    return automata_copy, state_offset
-
-def positive_closure_automata(automata, current_state):
-    automata_copy, state_offset = automata_state_change(automata)
-    return concatenation_automata(kleene_automata(automata_copy, current_state+state_offset), automata), state_offset+2
+    automata.add_transition(initial_state, 'ε', left_fragment.initial_state)
+    automata.add_transition(initial_state, 'ε', right_fragment.initial_state)
+    # the final states of the two fragments reach the new final state with ε
+    left_final_state = close_fragment(automata, left_fragment)
+    right_final_state = close_fragment(automata, right_fragment)
+    return Fragment(initial_state, [(left_final_state, 'ε'), (right_final_state, 'ε')])
 
-def build_automata(postfix_expression):
+# the final state of the left fragment is merged with the initial state of the right one
+def concatenation_automata(automata, right_fragment, left_fragment):
+    patch_fragment(automata, left_fragment, right_fragment.initial_state)
+    return Fragment(left_fragment.initial_state, right_fragment.dangling_edges)
+
+def kleene_automata(automata, fragment):
+    initial_state = automata.new_state()
+    automata.alphabet.add('ε')
+    final_state = close_fragment(automata, fragment)
+    # transition the final state of the fragment to its initial state
+    automata.add_transition(final_state, 'ε', fragment.initial_state)
+    # transition from the initial state to the initial state of the fragment
+    automata.add_transition(initial_state, 'ε', fragment.initial_state)
+    # the final state of the fragment and the initial state reach the new final state
+    return Fragment(initial_state, [(final_state, 'ε'), (initial_state, 'ε')])
+
+def question_automata(automata, fragment):
+    epsilon_fragment = operand_automata(automata, 'ε')
+    return or_automata(automata, epsilon_fragment, fragment)
+
+# the fragment loops back to its own initial state instead of being copied in front of its kleene closure
+def positive_closure_automata(automata, fragment):
+    automata.alphabet.add('ε')
+    final_state = close_fragment(automata, fragment)
+    automata.add_transition(final_state, 'ε', fragment.initial_state)
+    return Fragment(fragment.initial_state, [(final_state, 'ε')])
+
+# Thompson construction over fragments, every operator creates O(1) states and edges and nothing is copied
+def build_fragment(automata, postfix_expression):
     unary_operators = ['*','+','?']
     binary_operators = ['|','.']
     stack = []
-    next_state = 0
     for token in postfix_expression:
         # Checks if token is a valid operand
         if token not in unary_operators and token not in binary_operators:
-            stack.append(operand_automata(token, next_state))
-            next_state += 2
+            stack.append(operand_automata(automata, token))
         #else checks which operator is it
         elif token == '|':
-            stack.append(or_automata(stack.pop(), stack.pop(), next_state))
-            next_state += 2
+            stack.append(or_automata(automata, stack.pop(), stack.pop()))
         elif token == '.':
-            stack.append(concatenation_automata(stack.pop(), stack.pop()))
+            stack.append(concatenation_automata(automata, stack.pop(), stack.pop()))
         elif token == '*':
-            stack.append(kleene_automata(stack.pop(), next_state))
-            next_state += 2
+            stack.append(kleene_automata(automata, stack.pop()))
         elif token == '?':
-            stack.append(question_automata(stack.pop(), next_state))
-            next_state += 4
+            stack.append(question_automata(automata, stack.pop()))
         elif token == '+':
-            plus_closure_element, state_offset = positive_closure_automata(stack.pop(), next_state)
-            stack.append(plus_closure_element)
-            next_state += state_offset
+            stack.append(positive_closure_automata(automata, stack.pop()))
     return stack.pop()
 
+def build_automata(postfix_expression):
+    automata = Automata([], set(), [], None, [])
+    fragment = build_fragment(automata, postfix_expression)
+    automata.initial_state = fragment.initial_state
+    automata.final_states = [close_fragment(automata, fragment)]
+    return automata
+
+# joins the automata of every token rule under a new initial state, the same way or_automata joins two,
+# each final state remembers its rule id so that lower ids win ties between rules
+def tokens_automata(postfix_expressions):
+    automata = Automata([], {'ε'}, [], None, [])
+    automata.initial_state = automata.new_state()
+    for rule, postfix_expression in enumerate(postfix_expressions):
+        fragment = build_fragment(automata, postfix_expression)
+        automata.add_transition(automata.initial_state, 'ε', fragment.initial_state)
+        final_state = close_fragment(automata, fragment)
+        automata.final_states.append(final_state)
+        automata.final_rules[final_state] = rule
+    return automata
@@ -0,0 +1,200 @@
+# Created by: José Hurtarte
+# Created on: 14/03/2023
+# Last modified on: 15/03/2023
+# Description: Character sets stored as codepoint ranges and the partition of the alphabet in symbol classes
+
+from bisect import bisect_left, bisect_right
+
+MAX_CODEPOINT = 0x10FFFF
+# characters written with a backslash inside the text form of a set
+SET_SPECIAL_CHARACTERS = frozenset('\\]^-[')
+# control characters shown with the same escapes the parser reads
+CONTROL_ESCAPES = {'\n': '\\n', '\t': '\\t', '\r': '\\r', '\f': '\\f', '\v': '\\v'}
+
+
+class CharSet:
+    # set of characters kept as sorted, disjoint and non adjacent (low, high) codepoint ranges, both ends included.
+    # A whole [...] class, escape or wildcard is one CharSet, so it labels a single edge of the automata
+    __slots__ = ('ranges', 'lows')
+
+    def __init__(self, ranges):
+        merged = []
+        for low, high in sorted(ranges):
+            if merged and low <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+            else:
+                merged.append((low, high))
+        self.ranges = tuple(merged)
+        self.lows = [low for low, _ in merged]
+
+    @classmethod
+    def single(cls, character):
+        return cls([(ord(character), ord(character))])
+
+    def __contains__(self, character):
+        code = ord(character)
+        index = bisect_right(self.lows, code) - 1
+        return index >= 0 and code <= self.ranges[index][1]
+
+    def __eq__(self, other):
+        if not isinstance(other, CharSet):
+            return NotImplemented
+        return self.ranges == other.ranges
+
+    def __hash__(self):
+        return hash(self.ranges)
+
+    def __or__(self, other):
+        return CharSet(self.ranges + other.ranges)
+
+    def negate(self):
+        complement = []
+        low = 0
+        for range_low, range_high in self.ranges:
+            if range_low > low:
+                complement.append((low, range_low - 1))
+            low = range_high + 1
+        if low <= MAX_CODEPOINT:
+            complement.append((low, MAX_CODEPOINT))
+        return CharSet(complement)
+
+    # text form used in the printed postfix and the drawings, sets holding the last codepoint are shown negated.
+    # The wildcard is shown as [^\n] since a lone . is the concatenation in the postfix. The parser reads the text
+    # back as the same set, so letters and digits are never written after a backslash (\d or \x would be escapes)
+    def __str__(self):
+        if self in NAMED_SETS:
+            return NAMED_SETS[self]
+        if self.ranges and self.ranges[-1][1] == MAX_CODEPOINT and self.ranges != ((0, MAX_CODEPOINT),):
+            return '[^{}]'.format(self.negate().body())
+        if len(self.ranges) == 1 and self.ranges[0][0] == self.ranges[0][1]:
+            character = chr(self.ranges[0][0])
+            if character.isprintable() and not character.isalnum():
+                return '\\' + character
+            if not character.isprintable():
+                return show_character(character)
+        return '[{}]'.format(self.body())
+
+    __repr__ = __str__
+
+    def body(self):
+        parts = []
+        for low, high in self.ranges:
+            parts.append(set_character(chr(low)))
+            if high > low:
+                parts.append('-' + set_character(chr(high)) if high > low + 1 else set_character(chr(high)))
+        return ''.join(parts)
+
+
+# printable characters as they are, the others as the \n, \xHH, \uHHHH or \UHHHHHHHH escapes of the parser
+def show_character(character):
+    if character.isprintable():
+        return character
+    if character in CONTROL_ESCAPES:
+        return CONTROL_ESCAPES[character]
+    if ord(character) < 0x100:
+        return '\\x{:02x}'.format(ord(character))
+    if ord(character) < 0x10000:
+        return '\\u{:04x}'.format(ord(character))
+    return '\\U{:08x}'.format(ord(character))
+
+def set_character(character):
+    if character in SET_SPECIAL_CHARACTERS:
+        return '\\' + character
+    return show_character(character)
+
+def ranges_of(characters):
+    return [(ord(character), ord(character)) for character in characters]
+
+DIGIT = CharSet([(ord('0'), ord('9'))])
+WORD = CharSet([(ord('0'), ord('9')), (ord('A'), ord('Z')), (ord('_'), ord('_')), (ord('a'), ord('z'))])
+SPACE = CharSet(ranges_of(' \t\n\r\f\v'))
+# the wildcard matches every character but the newline
+ANY = CharSet.single('\n').negate()
+# escape -> set, the upper case escapes are the complements
+ESCAPE_SETS = {
+    'd': DIGIT, 'D': DIGIT.negate(),
+    'w': WORD, 'W': WORD.negate(),
+    's': SPACE, 'S': SPACE.negate(),
+}
+NAMED_SETS = {char_set: '\\' + escape for escape, char_set in ESCAPE_SETS.items()}
+
+# codepoint ranges of an edge label, a single character or a CharSet
+def label_ranges(label):
+    if isinstance(label, CharSet):
+        return label.ranges
+    return ((ord(label), ord(label)),)
+
+def label_contains(label, character):
+    if isinstance(label, CharSet):
+        return character in label
+    return label == character
+
+# sort key for mixed labels, characters first and then sets ordered by their ranges
+def label_key(label):
+    if isinstance(label, CharSet):
+        return (1, '', label.ranges)
+    return (0, label, ())
+
+# labels in json: characters as strings, sets as lists of [low, high] ranges
+def label_to_json(label):
+    if isinstance(label, CharSet):
+        return [list(char_range) for char_range in label.ranges]
+    return label
+
+def label_from_json(value):
+    if isinstance(value, list):
+        return CharSet([tuple(char_range) for char_range in value])
+    return value
+
+
+class SymbolClasses:
+    # partition of every codepoint in symbol classes, characters of a class are inside exactly the same labels
+    # so automata and tables only need one column per class. Interval i holds the codepoints from starts[i]
+    # to starts[i + 1] - 1, all of class interval_classes[i]. Class 0 holds the characters of no label
+    def __init__(self, starts, interval_classes):
+        self.starts = starts
+        self.interval_classes = interval_classes
+        self.count = max(interval_classes, default=0) + 1
+
+    def class_of(self, character):
+        return self.interval_classes[bisect_right(self.starts, ord(character)) - 1]
+
+    # class -> one character of the class (the lowest), None for classes without characters
+    def representatives(self):
+        representatives = [None] * self.count
+        for start, symbol_class in zip(self.starts, self.interval_classes):
+            if representatives[symbol_class] is None:
+                representatives[symbol_class] = chr(start)
+        return representatives
+
+    # same partition with class c renamed to class_map[c], intervals that end up in the same class are joined
+    def renamed(self, class_map):
+        starts = []
+        interval_classes = []
+        for start, symbol_class in zip(self.starts, self.interval_classes):
+            symbol_class = class_map[symbol_class]
+            if not interval_classes or interval_classes[-1] != symbol_class:
+                starts.append(start)
+                interval_classes.append(symbol_class)
+        return SymbolClasses(starts, interval_classes)
+
+# the range boundaries of all the labels cut the codepoints in intervals, intervals inside the same labels
+# share a class. Classes are numbered by their lowest codepoint, so the result does not depend on the label order
+def partition_alphabet(labels):
+    labels = list(labels)
+    cuts = {0}
+    for label in labels:
+        for low, high in label_ranges(label):
+            cuts.add(low)
+            if high < MAX_CODEPOINT:
+                cuts.add(high + 1)
+    starts = sorted(cuts)
+    # interval -> ids of the labels containing it, filled range by range so the cost is the size of the result
+    signatures = [[] for _ in starts]
+    for label_id, label in enumerate(labels):
+        for low, high in label_ranges(label):
+            for interval in range(bisect_left(starts, low), bisect_left(starts, high + 1)):
+                signatures[interval].append(label_id)
+    class_ids = {(): 0}
+    interval_classes = [class_ids.setdefault(tuple(signature), len(class_ids)) for signature in signatures]
+    return SymbolClasses(starts, interval_classes)
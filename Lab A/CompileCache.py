@@ -0,0 +1,139 @@
+# Created by: José Hurtarte
+# Created on: 05/03/2023
+# Last modified on: 15/03/2023
+# Description: Two layer cache (in-process LRU and on-disk store) for compiled regular expressions
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+from Automata import Automata
+from CharClass import label_from_json, label_to_json
+from DFA import CompactDFA
+
+# bump whenever the postfix or the automata produced for a pattern changes, old entries are then ignored
+COMPILER_VERSION = '4'
+ENTRY_MAGIC = b'LXC1'
+ENTRY_HEADER = '<4sI'
+# later stages cached next to the ε-NFA, kind -> class whose to_bytes/from_bytes store it
+COMPILED_KINDS = {'reduced': Automata, 'dfa': CompactDFA, 'direct': CompactDFA}
+
+
+class CompileCache:
+    # maps a normalized pattern to its (postfix, automata), the most recently used entries stay in memory
+    # and every entry is also written to directory (when given) so it survives restarts.
+    # The reduced automata and the minimal DFAs of a pattern are kept the same way, one entry per kind
+    def __init__(self, directory=None, max_entries=256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, pattern, kind='nfa'):
+        if kind == 'nfa':
+            return hashlib.sha256('{}\0{}'.format(COMPILER_VERSION, pattern).encode('utf-8')).hexdigest()
+        return hashlib.sha256('{}\0{}\0{}'.format(COMPILER_VERSION, kind, pattern).encode('utf-8')).hexdigest()
+
+    def path(self, key, kind='nfa'):
+        return os.path.join(self.directory, '{}.{}'.format(key, kind))
+
+    def get(self, pattern):
+        return self.lookup(self.key(pattern), self.load)
+
+    def put(self, pattern, postfix, automata):
+        key = self.key(pattern)
+        self.remember(key, (postfix, automata))
+        if self.directory is not None:
+            self.store(key, postfix, automata)
+
+    # reduced automata or minimal DFA of the pattern, kind is one of COMPILED_KINDS
+    def get_compiled(self, pattern, kind):
+        return self.lookup(self.key(pattern, kind), lambda key: self.load_compiled(key, kind))
+
+    def put_compiled(self, pattern, kind, compiled):
+        key = self.key(pattern, kind)
+        self.remember(key, compiled)
+        if self.directory is not None:
+            self.write(self.path(key, kind), compiled.to_bytes())
+
+    def lookup(self, key, load):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return entry
+        # the disk store is only read on a memory miss
+        entry = load(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self.remember(key, entry)
+        return entry
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key), 'rb') as entry_file:
+                data = entry_file.read()
+            magic, postfix_size = struct.unpack_from(ENTRY_HEADER, data)
+            if magic != ENTRY_MAGIC:
+                return None
+            offset = struct.calcsize(ENTRY_HEADER)
+            postfix = [label_from_json(token) for token in json.loads(data[offset:offset + postfix_size].decode('utf-8'))]
+            automata = Automata.from_bytes(memoryview(data)[offset + postfix_size:])
+        except (OSError, ValueError, struct.error):
+            # missing, truncated or foreign files are treated as a miss and rewritten by the next put
+            return None
+        return postfix, automata
+
+    def load_compiled(self, key, kind):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(key, kind), 'rb') as entry_file:
+                return COMPILED_KINDS[kind].from_bytes(entry_file.read())
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def store(self, key, postfix, automata):
+        encoded_postfix = json.dumps([label_to_json(token) for token in postfix], ensure_ascii=False).encode('utf-8')
+        data = struct.pack(ENTRY_HEADER, ENTRY_MAGIC, len(encoded_postfix)) + encoded_postfix + automata.to_bytes()
+        self.write(self.path(key), data)
+
+    def write(self, path, data):
+        # written to a temporary file first so concurrent readers never see half an entry
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as entry_file:
+                entry_file.write(data)
+            os.replace(temporary_path, path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
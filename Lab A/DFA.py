@@ -0,0 +1,443 @@
+# Created by: José Hurtarte
+# Created on: 02/03/2023
+# Last modified on: 15/03/2023
+# Description: DFA engines built on top of the NFA from the Automata module
+
+from array import array
+from collections import OrderedDict
+import struct
+
+from CharClass import SymbolClasses, label_key, partition_alphabet
+
+DEAD_STATE = 0
+START_STATE = 1
+# column 0 of the table is the class of every character outside the alphabet
+OTHER_CLASS = 0
+DFA_MAGIC = b'LXD2'
+
+
+class LazyDFA:
+    # DFA states are sets of NFA states, created on demand with subset construction over the ε-closures
+    # and kept in a bounded LRU cache. When the cache thrashes the scan falls back to NFA simulation.
+    def __init__(self, automata, cache_size=1024, thrash_ratio=0.5):
+        self.automata = automata
+        self.final_states = frozenset(automata.final_states)
+        self.initial_state = automata.epsilon_closure(automata.initial_state)
+        self.cache_size = cache_size
+        self.thrash_ratio = thrash_ratio
+        # DFA state -> {symbol class: next DFA state}, ordered from least to most recently used
+        # edges are kept per symbol class, so every character of a [...] class shares one entry
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+    def transition(self, states, symbol):
+        symbol_class = self.automata.symbol_classes.get(symbol)
+        if symbol_class is None:
+            symbol_class = self.automata.symbol_class(symbol)
+        edges = self.cache.get(states)
+        if edges is None:
+            edges = {}
+            self.cache[states] = edges
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.cache.move_to_end(states)
+        next_states = edges.get(symbol_class)
+        if next_states is None:
+            self.misses += 1
+            next_states = self.automata.step_class(states, symbol_class)
+            edges[symbol_class] = next_states
+        else:
+            self.hits += 1
+        return next_states
+
+    def is_final(self, states):
+        return not self.final_states.isdisjoint(states)
+
+    # the cache is thrashing when most steps of this scan are evicting DFA states
+    def is_thrashing(self, steps, evictions):
+        return steps >= self.cache_size and evictions > self.thrash_ratio * steps
+
+    # iterates over the DFA states visited while reading text from pos, the empty set is the dead state
+    def run(self, text, pos=0):
+        states = self.initial_state
+        yield states
+        initial_evictions = self.evictions
+        use_nfa = False
+        for i in range(pos, len(text)):
+            if use_nfa:
+                states = self.automata.step(states, text[i])
+            else:
+                states = self.transition(states, text[i])
+                if self.is_thrashing(i - pos + 1, self.evictions - initial_evictions):
+                    self.fallbacks += 1
+                    use_nfa = True
+            yield states
+            if not states:
+                return
+
+    # returns the end of the longest match starting at pos, None if nothing matches
+    def match(self, text, pos=0):
+        last_end = None
+        for i, states in enumerate(self.run(text, pos), pos):
+            if self.is_final(states):
+                last_end = i
+        return last_end
+
+    def fullmatch(self, text):
+        visited = 0
+        for states in self.run(text):
+            visited += 1
+        return visited == len(text) + 1 and self.is_final(states)
+
+    # leftmost-longest search in one pass over text, returns (start, end) of the match or None.
+    # Like Automata.search, threads maps every live DFA state to the earliest start reaching it, a later start
+    # in the same state can only end the same way so it is dropped. The work is O(len(text) x live DFA states)
+    # instead of one anchored scan per start position. Falls back to NFA simulation like run() when the cache thrashes
+    def search(self, text, pos=0):
+        threads = {}
+        best = None
+        steps = 0
+        initial_evictions = self.evictions
+        use_nfa = False
+        for i in range(pos, len(text) + 1):
+            if best is None:
+                threads.setdefault(self.initial_state, i)
+            # threads are ordered by start, the first accepting one is the leftmost match ending here
+            for states, start in threads.items():
+                if self.is_final(states):
+                    if best is None or start <= best[0]:
+                        best = (start, i)
+                        threads = {states: start for states, start in threads.items() if start <= best[0]}
+                    break
+            if i == len(text) or (not threads and best is not None):
+                break
+            next_threads = {}
+            if use_nfa:
+                symbol_class = self.automata.symbol_class(text[i])
+                for states, start in threads.items():
+                    states = self.automata.step_class(states, symbol_class)
+                    if states:
+                        next_threads.setdefault(states, start)
+            else:
+                for states, start in threads.items():
+                    states = self.transition(states, text[i])
+                    if states:
+                        next_threads.setdefault(states, start)
+                steps += len(threads)
+                if self.is_thrashing(steps, self.evictions - initial_evictions):
+                    self.fallbacks += 1
+                    use_nfa = True
+            threads = next_threads
+        return best
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'states': len(self.cache),
+            'cache_size': self.cache_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'fallbacks': self.fallbacks,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+
+class CompactDFA:
+    # dense transition table of states x symbol classes stored row by row in an array('i'),
+    # state 0 is the dead state and state 1 the start state, accepting states are kept in a bitmap.
+    # symbol_classes maps every codepoint to its column, class 0 (OTHER_CLASS) being the characters of no label
+    def __init__(self, symbol_classes, table, accepting):
+        self.symbol_classes = symbol_classes
+        # character -> class, filled on first use of every character
+        self.classes = {}
+        self.width = symbol_classes.count
+        self.table = table
+        self.accepting = accepting
+        self.state_count = len(table) // self.width
+        self.numpy_cache = None
+
+    def is_final(self, state):
+        return (self.accepting[state >> 3] >> (state & 7)) & 1
+
+    def class_of(self, character):
+        symbol_class = self.classes.get(character)
+        if symbol_class is None:
+            symbol_class = self.symbol_classes.class_of(character)
+            self.classes[character] = symbol_class
+        return symbol_class
+
+    def next_state(self, state, symbol):
+        return self.table[state * self.width + self.class_of(symbol)]
+
+    def match(self, text, pos=0):
+        table = self.table
+        width = self.width
+        classes = self.classes
+        state = START_STATE
+        last_end = pos if self.is_final(state) else None
+        for i in range(pos, len(text)):
+            symbol_class = classes.get(text[i])
+            if symbol_class is None:
+                symbol_class = self.class_of(text[i])
+            state = table[state * width + symbol_class]
+            if state == DEAD_STATE:
+                break
+            if self.is_final(state):
+                last_end = i + 1
+        return last_end
+
+    def fullmatch(self, text):
+        table = self.table
+        width = self.width
+        classes = self.classes
+        state = START_STATE
+        for character in text:
+            symbol_class = classes.get(character)
+            if symbol_class is None:
+                symbol_class = self.class_of(character)
+            state = table[state * width + symbol_class]
+            if state == DEAD_STATE:
+                return False
+        return bool(self.is_final(state))
+
+    # leftmost-longest search in one pass over text, returns (start, end) of the match or None,
+    # same threads as LazyDFA.search with table states
+    def search(self, text, pos=0):
+        table = self.table
+        width = self.width
+        classes = self.classes
+        threads = {}
+        best = None
+        for i in range(pos, len(text) + 1):
+            if best is None:
+                threads.setdefault(START_STATE, i)
+            for state, start in threads.items():
+                if self.is_final(state):
+                    if best is None or start <= best[0]:
+                        best = (start, i)
+                        threads = {state: start for state, start in threads.items() if start <= best[0]}
+                    break
+            if i == len(text) or (not threads and best is not None):
+                break
+            symbol_class = classes.get(text[i])
+            if symbol_class is None:
+                symbol_class = self.class_of(text[i])
+            next_threads = {}
+            for state, start in threads.items():
+                state = table[state * width + symbol_class]
+                if state != DEAD_STATE:
+                    next_threads.setdefault(state, start)
+            threads = next_threads
+        return best
+
+    # numpy views of the table, built on first use so numpy is only needed by the batch api
+    def numpy_tables(self):
+        if self.numpy_cache is None:
+            import numpy
+            table = numpy.frombuffer(self.table, dtype=numpy.int32).copy()
+            accepting = numpy.array([bool(self.is_final(state)) for state in range(self.state_count)])
+            self.numpy_cache = (table, accepting)
+        return self.numpy_cache
+
+    # codepoint -> symbol class lookup array covering codepoints up to max_code
+    def class_lookup(self, max_code):
+        import numpy
+        starts = numpy.array(self.symbol_classes.starts, dtype=numpy.int64)
+        interval_classes = numpy.array(self.symbol_classes.interval_classes, dtype=numpy.int32)
+        return interval_classes[numpy.searchsorted(starts, numpy.arange(max_code + 1), side='right') - 1]
+
+    # fullmatch of many inputs at once, inputs is a list of strings or a padded (rows x columns) uint8/uint32
+    # array of codepoints. For arrays, lengths gives the length of every row, without it each row ends at its first 0.
+    # All rows advance together, one gather in the flat table per character position, rows leave the batch as soon as
+    # they die or end, and the loop stops once no row is left. Returns a boolean numpy array.
+    def fullmatch_batch(self, inputs, lengths=None):
+        import numpy
+        if isinstance(inputs, (list, tuple)):
+            codes, lengths = encode_batch(inputs)
+        else:
+            codes = numpy.asarray(inputs)
+            if lengths is None:
+                is_zero = codes == 0
+                lengths = numpy.where(is_zero.any(axis=1), is_zero.argmax(axis=1), codes.shape[1])
+            lengths = numpy.asarray(lengths)
+        table, accepting = self.numpy_tables()
+        final_states = numpy.full(codes.shape[0], START_STATE, dtype=numpy.int32)
+        if codes.size == 0:
+            return accepting[final_states]
+        # one row of classes per character position so every step reads a contiguous row
+        columns = self.class_lookup(int(codes.max()))[codes.T]
+        # the live rows with their states and lengths, rows leave these arrays once they are dead or fully read
+        rows = numpy.flatnonzero(lengths > 0)
+        states = final_states[rows]
+        row_lengths = lengths[rows]
+        for column, column_classes in enumerate(columns):
+            if rows.size == 0:
+                break
+            states = table[states * self.width + column_classes[rows]]
+            live = (states != DEAD_STATE) & (row_lengths > column + 1)
+            if not live.all():
+                final_states[rows[~live]] = states[~live]
+                rows = rows[live]
+                states = states[live]
+                row_lengths = row_lengths[live]
+        return accepting[final_states]
+
+    # header, the interval starts and classes of the partition, the table and the accepting bitmap
+    def to_bytes(self):
+        intervals = array('i', self.symbol_classes.starts) + array('i', self.symbol_classes.interval_classes)
+        header = struct.pack('<4sIII', DFA_MAGIC, self.state_count, self.width, len(self.symbol_classes.starts))
+        return header + intervals.tobytes() + self.table.tobytes() + bytes(self.accepting)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, state_count, width, interval_count = struct.unpack_from('<4sIII', data)
+        if magic != DFA_MAGIC:
+            raise ValueError('Invalid compiled DFA data')
+        offset = struct.calcsize('<4sIII')
+        intervals = array('i')
+        intervals.frombytes(data[offset:offset + 2 * interval_count * intervals.itemsize])
+        offset += 2 * interval_count * intervals.itemsize
+        symbol_classes = SymbolClasses(intervals[:interval_count].tolist(), intervals[interval_count:].tolist())
+        table = array('i')
+        table.frombytes(data[offset:offset + state_count * width * table.itemsize])
+        offset += state_count * width * table.itemsize
+        accepting = bytearray(data[offset:offset + (state_count + 7) // 8])
+        if len(table) != state_count * width or len(accepting) != (state_count + 7) // 8:
+            raise ValueError('Truncated compiled DFA data')
+        return cls(symbol_classes, table, accepting)
+
+
+# packs strings into a zero padded uint32 codepoint matrix and their lengths, numpy unicode arrays
+# are fixed width UCS4 so the matrix is just a view of one, no python loop per character.
+# numpy drops trailing NULs of the strings, so the lengths come from python and the matrix is widened
+# with zeros (the dropped NULs) when the longest string ends in NULs
+def encode_batch(strings):
+    import numpy
+    lengths = numpy.fromiter(map(len, strings), dtype=numpy.int64, count=len(strings))
+    packed = numpy.array(strings, dtype=numpy.str_).reshape(len(strings))
+    width = packed.dtype.itemsize // 4
+    codes = packed.view(numpy.uint32).reshape(len(strings), width)
+    longest = int(lengths.max(initial=0))
+    if longest > width:
+        codes = numpy.pad(codes, ((0, 0), (0, longest - width)))
+    return codes, lengths
+
+def accepting_bitmap(final_states, state_count):
+    accepting = bytearray((state_count + 7) // 8)
+    for state in final_states:
+        accepting[state >> 3] |= 1 << (state & 7)
+    return accepting
+
+# eager subset construction over the ε-closures of the NFA, the result is complete but not minimal.
+# The table has one column per symbol class of the labels, each class is stepped with one of its characters
+def subset_construction(automata):
+    symbol_classes = partition_alphabet(sorted(automata.labels, key=label_key))
+    representatives = symbol_classes.representatives()[1:]
+    nfa_final_states = frozenset(automata.final_states)
+    # the dead state (empty set) and the start state get the fixed ids 0 and 1
+    dfa_states = {frozenset(): DEAD_STATE, automata.epsilon_closure(automata.initial_state): START_STATE}
+    pending = list(dfa_states)
+    table = array('i')
+    final_states = []
+    for states in pending:
+        if not nfa_final_states.isdisjoint(states):
+            final_states.append(dfa_states[states])
+        table.append(DEAD_STATE)
+        for character in representatives:
+            next_states = automata.step(states, character)
+            if next_states not in dfa_states:
+                dfa_states[next_states] = len(pending)
+                pending.append(next_states)
+            table.append(dfa_states[next_states])
+    return CompactDFA(symbol_classes, table, accepting_bitmap(final_states, len(pending)))
+
+# Hopcroft partition refinement, equivalent states are merged into one row of the table
+def minimize_dfa(dfa):
+    width = dfa.width
+    table = dfa.table
+    state_count = dfa.state_count
+    # inverse[symbol_class][state] lists the states that reach state by reading that class
+    inverse = [[[] for _ in range(state_count)] for _ in range(width)]
+    for state in range(state_count):
+        row = state * width
+        for symbol_class in range(width):
+            inverse[symbol_class][table[row + symbol_class]].append(state)
+    final_block = {state for state in range(state_count) if dfa.is_final(state)}
+    other_block = set(range(state_count)) - final_block
+    blocks = [block for block in (final_block, other_block) if block]
+    block_of = [0] * state_count
+    for block_id, block in enumerate(blocks):
+        for state in block:
+            block_of[state] = block_id
+    pending = set(range(len(blocks)))
+    while pending:
+        splitter = list(blocks[pending.pop()])
+        for symbol_class in range(width):
+            predecessors = {}
+            for state in splitter:
+                for predecessor in inverse[symbol_class][state]:
+                    predecessors.setdefault(block_of[predecessor], set()).add(predecessor)
+            for block_id, inside in predecessors.items():
+                block = blocks[block_id]
+                if len(inside) == len(block):
+                    continue
+                block -= inside
+                new_block_id = len(blocks)
+                blocks.append(inside)
+                for state in inside:
+                    block_of[state] = new_block_id
+                if block_id in pending or len(inside) <= len(block):
+                    pending.add(new_block_id)
+                else:
+                    pending.add(block_id)
+    # renumber the blocks keeping the dead state at 0 and the start state at 1
+    block_ids = {block_of[DEAD_STATE]: DEAD_STATE}
+    if block_of[START_STATE] not in block_ids:
+        block_ids[block_of[START_STATE]] = START_STATE
+    else:
+        # the start state is dead: the language is empty, keep a separate dead start row anyway
+        block_ids[-1] = START_STATE
+    representatives = {DEAD_STATE: DEAD_STATE, START_STATE: START_STATE}
+    for state in range(state_count):
+        if block_of[state] not in block_ids:
+            block_ids[block_of[state]] = len(block_ids)
+            representatives[block_ids[block_of[state]]] = state
+    minimized = array('i', [DEAD_STATE]) * (len(block_ids) * width)
+    final_states = []
+    for new_state, state in representatives.items():
+        row = state * width
+        for symbol_class in range(1, width):
+            minimized[new_state * width + symbol_class] = block_ids[block_of[table[row + symbol_class]]]
+        if dfa.is_final(state):
+            final_states.append(new_state)
+    return merge_columns(CompactDFA(dfa.symbol_classes, minimized, accepting_bitmap(final_states, len(block_ids))))
+
+# symbol classes with the same column in the table lead every state to the same place, they are joined in
+# one class. Columns equal to the OTHER_CLASS one (all dead) join class 0
+def merge_columns(dfa):
+    width = dfa.width
+    columns = {}
+    class_map = []
+    for symbol_class in range(width):
+        column = tuple(dfa.table[state * width + symbol_class] for state in range(dfa.state_count))
+        class_map.append(columns.setdefault(column, len(columns)))
+    if len(columns) == width:
+        return dfa
+    kept = [class_map.index(new_class) for new_class in range(len(columns))]
+    table = array('i', [dfa.table[state * width + symbol_class] for state in range(dfa.state_count) for symbol_class in kept])
+    return CompactDFA(dfa.symbol_classes.renamed(class_map), table, dfa.accepting)
+
+def compile_dfa(automata):
+    return minimize_dfa(subset_construction(automata))
@@ -0,0 +1,141 @@
+# Created by: José Hurtarte
+# Created on: 12/03/2023
+# Last modified on: 15/03/2023
+# Description: Direct regex -> DFA construction from the expression tree (followpos method)
+
+from array import array
+
+from Automata import EPSILON
+from CharClass import label_contains, label_key, partition_alphabet
+from DFA import CompactDFA, DEAD_STATE, START_STATE, accepting_bitmap, minimize_dfa
+from ExpressionTree import Tree, build_tree, postorder_traversal
+
+END_MARKER = '#'
+EMPTY_POSITIONS = (0, 0)
+
+
+# position sets are offset bitsets (offset, bits): position offset + i is in the set when bit i is set and
+# offset is the lowest position, so equal sets are equal tuples. A set costs one bit per position of its span
+# instead of one per position of the whole pattern, sets of long concatenations stay a few bits wide
+def single_position(position):
+    return (position, 1)
+
+def union_positions(first, second):
+    if not first[1]:
+        return second
+    if not second[1]:
+        return first
+    offset = min(first[0], second[0])
+    return (offset, first[1] << (first[0] - offset) | second[1] << (second[0] - offset))
+
+# sorted list of the positions of a set
+def positions_of(positions):
+    offset, bits = positions
+    found = []
+    while bits:
+        lowest = bits & -bits
+        found.append(offset + lowest.bit_length() - 1)
+        bits ^= lowest
+    return found
+
+def last_position(positions):
+    return positions[0] + positions[1].bit_length() - 1
+
+# computes nullable, firstpos and lastpos of every node and the followpos of every position,
+# position sets are offset bitsets. The tree is walked without recursion.
+def followpos_table(tree):
+    symbols = []
+    followpos = []
+    nullable = {}
+    firstpos = {}
+    lastpos = {}
+    for node in postorder_traversal(tree):
+        key = id(node)
+        left = id(node.leftChild) if node.leftChild else None
+        right = id(node.rightChild) if node.rightChild else None
+        if node.leftChild is None and node.rightChild is None:
+            if node.key == EPSILON:
+                nullable[key], firstpos[key], lastpos[key] = True, EMPTY_POSITIONS, EMPTY_POSITIONS
+            else:
+                position = len(symbols)
+                symbols.append(node.key)
+                followpos.append(EMPTY_POSITIONS)
+                nullable[key], firstpos[key], lastpos[key] = False, single_position(position), single_position(position)
+        elif node.key == '|':
+            nullable[key] = nullable[left] or nullable[right]
+            firstpos[key] = union_positions(firstpos[left], firstpos[right])
+            lastpos[key] = union_positions(lastpos[left], lastpos[right])
+        elif node.key == '.':
+            nullable[key] = nullable[left] and nullable[right]
+            firstpos[key] = union_positions(firstpos[left], firstpos[right]) if nullable[left] else firstpos[left]
+            lastpos[key] = union_positions(lastpos[left], lastpos[right]) if nullable[right] else lastpos[right]
+            for position in positions_of(lastpos[left]):
+                followpos[position] = union_positions(followpos[position], firstpos[right])
+        else:
+            # unary operators only have a left child
+            nullable[key] = node.key != '+' or nullable[left]
+            firstpos[key] = firstpos[left]
+            lastpos[key] = lastpos[left]
+            if node.key in '*+':
+                for position in positions_of(lastpos[left]):
+                    followpos[position] = union_positions(followpos[position], firstpos[left])
+        # children are no longer needed once their parent is computed
+        for child in (left, right):
+            if child is not None:
+                del nullable[child], firstpos[child], lastpos[child]
+    return symbols, followpos, firstpos[id(tree)]
+
+# builds the DFA straight from the syntax tree, no ε-NFA and no subset construction over it,
+# every DFA state is the set of positions that can be read next
+def direct_dfa(tree):
+    end_marker = Tree(END_MARKER)
+    augmented = Tree('.')
+    augmented.leftChild = tree
+    augmented.rightChild = end_marker
+    position_symbols, followpos, start_positions = followpos_table(augmented)
+    # the end marker is the last leaf in postorder, so it is the last position
+    end_position = len(position_symbols) - 1
+    labels = sorted(set(position_symbols[:-1]), key=label_key)
+    symbol_classes = partition_alphabet(labels)
+    # label -> symbol classes of the characters it holds, a state only visits the labels of its own positions
+    # so the work per state follows the size of the state, not the length of the pattern
+    label_classes = {label: [] for label in labels}
+    for symbol_class, character in enumerate(symbol_classes.representatives()):
+        if symbol_class == 0:
+            continue
+        for label in labels:
+            if label_contains(label, character):
+                label_classes[label].append(symbol_class)
+    # followpos split in offsets and bits, empty sets get the highest offset so they never lower a minimum
+    follow_offsets = [offset if bits else end_position for offset, bits in followpos]
+    follow_bits = [bits for _, bits in followpos]
+    dfa_states = {EMPTY_POSITIONS: DEAD_STATE, start_positions: START_STATE}
+    pending = [EMPTY_POSITIONS, start_positions]
+    table = array('i')
+    final_states = []
+    for positions in pending:
+        if positions[1] and last_position(positions) == end_position:
+            final_states.append(dfa_states[positions])
+        state_positions = positions_of(positions)
+        # the end marker is the highest position and is followed by nothing
+        if state_positions and state_positions[-1] == end_position:
+            state_positions.pop()
+        # the next set of every class is or-ed relative to the lowest followpos offset of the state
+        base = min(map(follow_offsets.__getitem__, state_positions), default=0)
+        class_bits = [0] * symbol_classes.count
+        for position in state_positions:
+            bits = follow_bits[position] << (follow_offsets[position] - base)
+            for symbol_class in label_classes[position_symbols[position]]:
+                class_bits[symbol_class] |= bits
+        table.append(DEAD_STATE)
+        for bits in class_bits[1:]:
+            lowest = (bits & -bits).bit_length() - 1
+            next_positions = (base + lowest, bits >> lowest) if bits else EMPTY_POSITIONS
+            if next_positions not in dfa_states:
+                dfa_states[next_positions] = len(pending)
+                pending.append(next_positions)
+            table.append(dfa_states[next_positions])
+    return CompactDFA(symbol_classes, table, accepting_bitmap(final_states, len(pending)))
+
+def compile_direct_dfa(postfix_expression):
+    return minimize_dfa(direct_dfa(build_tree(postfix_expression)))
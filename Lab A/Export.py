@@ -0,0 +1,162 @@
+# Created by: José Hurtarte
+# Created on: 08/03/2023
+# Last modified on: 14/03/2023
+# Description: Headless exporters (DOT, JSON, binary) and deferred Graphviz rendering
+
+import json
+
+from CharClass import label_key, label_to_json
+from ExpressionTree import postorder_traversal, postorder_traversal_draw
+
+EXPORT_EXTENSIONS = {'dot': '.dot', 'json': '.json', 'binary': '.nfa'}
+
+
+def quote(value):
+    return '"{}"'.format(str(value).replace('\\', '\\\\').replace('"', '\\"'))
+
+
+class DotWriter:
+    # collects DOT statements in pure Python, it has the node/edge methods of graphviz.Digraph
+    # so the existing drawing functions can write into it
+    def __init__(self, name=None, graph_attr=None):
+        self.name = name
+        self.lines = []
+        if graph_attr:
+            self.attr('graph', **graph_attr)
+
+    def attributes(self, label=None, attrs=None):
+        attrs = dict(attrs or {})
+        if label is not None:
+            attrs['label'] = label
+        if not attrs:
+            return ''
+        return ' [{}]'.format(' '.join('{}={}'.format(key, quote(value)) for key, value in attrs.items()))
+
+    def attr(self, kind=None, **attrs):
+        if kind is None:
+            self.lines.extend('\t{}={}'.format(key, quote(value)) for key, value in attrs.items())
+        else:
+            self.lines.append('\t{}{}'.format(kind, self.attributes(attrs=attrs)))
+
+    def node(self, name, label=None, **attrs):
+        self.lines.append('\t{}{}'.format(quote(name), self.attributes(label, attrs)))
+
+    def edge(self, tail_name, head_name, label=None, **attrs):
+        self.lines.append('\t{} -> {}{}'.format(quote(tail_name), quote(head_name), self.attributes(label, attrs)))
+
+    @property
+    def source(self):
+        header = 'digraph {} {{'.format(quote(self.name)) if self.name else 'digraph {'
+        return '\n'.join([header] + self.lines + ['}']) + '\n'
+
+
+# same layout as the original draw_automata: left to right, circles, double circles for the final states
+def automata_to_dot(automata):
+    f = DotWriter('finite_state_machine')
+    f.attr(rankdir='LR')
+    f.attr('node', shape='circle')
+    final_states = set(automata.final_states)
+    inner_nodes = [state for state in automata.states if state not in final_states and state != automata.initial_state]
+    f.node('start_mark', shape='point', style='invis')
+    f.edge('start_mark', automata.initial_state)
+    for state in [automata.initial_state] + inner_nodes:
+        f.node(state)
+        for symbol, next_state in automata.edges(state):
+            f.edge(state, next_state, label=symbol)
+    for state in automata.final_states:
+        f.node(state, shape='doublecircle')
+        for symbol, next_state in automata.edges(state):
+            f.edge(state, next_state, label=symbol)
+    return f.source
+
+# placeholder drawn instead of automata too big to be worth rendering
+def automata_summary_dot(automata):
+    f = DotWriter('finite_state_machine')
+    f.node('summary', label='{} states, {} transitions (not drawn)'.format(len(automata.states), automata.transition_count()), shape='box')
+    return f.source
+
+def tree_to_dot(tree):
+    digraph = DotWriter(graph_attr={'dpi': str(200)})
+    postorder_traversal_draw(tree, digraph)
+    return digraph.source
+
+# character sets are written as lists of [low, high] codepoint ranges
+def automata_to_json(automata):
+    transitions = [[state, label_to_json(symbol), next_state] for state in automata.states for symbol, next_state in automata.edges(state)]
+    return json.dumps({
+        'states': automata.states,
+        'alphabet': [label_to_json(symbol) for symbol in sorted(automata.alphabet, key=label_key)],
+        'initial_state': automata.initial_state,
+        'final_states': automata.final_states,
+        'transitions': transitions,
+    }, ensure_ascii=False)
+
+# flat list of nodes in postorder, children are referenced by index so any depth can be encoded
+def tree_to_json(tree):
+    nodes = []
+    index_of = {}
+    for node in postorder_traversal(tree):
+        index_of[id(node)] = len(nodes)
+        nodes.append({
+            'key': label_to_json(node.key),
+            'left': index_of[id(node.leftChild)] if node.leftChild else None,
+            'right': index_of[id(node.rightChild)] if node.rightChild else None,
+        })
+    return json.dumps({'root': len(nodes) - 1, 'nodes': nodes}, ensure_ascii=False)
+
+# writes automata (and tree for the text formats) next to path, returns the written paths
+def export_files(path, export_format, automata, tree=None):
+    if export_format not in EXPORT_EXTENSIONS:
+        raise ValueError('Unknown export format {}, expected one of: {}'.format(export_format, ', '.join(EXPORT_EXTENSIONS)))
+    written = []
+    automata_path = path + EXPORT_EXTENSIONS[export_format]
+    if export_format == 'binary':
+        with open(automata_path, 'wb') as export_file:
+            export_file.write(automata.to_bytes())
+        return [automata_path]
+    exporters = {'dot': (automata_to_dot, tree_to_dot), 'json': (automata_to_json, tree_to_json)}
+    automata_exporter, tree_exporter = exporters[export_format]
+    with open(automata_path, 'w', encoding='utf-8') as export_file:
+        export_file.write(automata_exporter(automata))
+    written.append(automata_path)
+    if tree is not None:
+        tree_path = path + ' tree' + EXPORT_EXTENSIONS[export_format]
+        with open(tree_path, 'w', encoding='utf-8') as export_file:
+            export_file.write(tree_exporter(tree))
+        written.append(tree_path)
+    return written
+
+
+class RenderQueue:
+    # rendering jobs are only turned into DOT and handed to Graphviz when render() is called,
+    # automata with more than max_states states are skipped or replaced by a summary node
+    def __init__(self, max_states=None, oversize='summary', format='png'):
+        if oversize not in ('summary', 'skip'):
+            raise ValueError('oversize must be summary or skip')
+        self.max_states = max_states
+        self.oversize = oversize
+        self.format = format
+        self.jobs = []
+
+    def add_automata(self, automata, path):
+        self.jobs.append(('automata', automata, path))
+
+    def add_tree(self, tree, path):
+        self.jobs.append(('tree', tree, path))
+
+    def render(self):
+        # graphviz is only needed when something is actually rendered
+        from graphviz import Source
+        rendered = []
+        jobs, self.jobs = self.jobs, []
+        for kind, item, path in jobs:
+            if kind == 'tree':
+                source = tree_to_dot(item)
+            elif self.max_states is not None and len(item.states) > self.max_states:
+                if self.oversize == 'skip':
+                    continue
+                source = automata_summary_dot(item)
+            else:
+                source = automata_to_dot(item)
+            rendered.append(Source(source).render(path, format=self.format))
+        return rendered
@@ -3,9 +3,10 @@
 # Last modified on: 26/02/2023
 # Description: Automata module and class
 
-from graphviz import Digraph
-
 class Tree:
+    # slots instead of a __dict__ per node, generated patterns build trees with hundreds of thousands of nodes
+    __slots__ = ('key', 'leftChild', 'rightChild')
+
     def __init__(self, root):
         self.key = root
         self.leftChild = None
@@ -62,14 +63,45 @@ def shunting_yard(user_input):
 
 
 
+# the traversals use an explicit stack, so trees of any depth can be walked without hitting the recursion limit
+def preorder_traversal(tree):
+    stack = [tree] if tree else []
+    while stack:
+        node = stack.pop()
+        yield node
+        if node.rightChild:
+            stack.append(node.rightChild)
+        if node.leftChild:
+            stack.append(node.leftChild)
+
+def postorder_traversal(tree):
+    stack = [(tree, False)] if tree else []
+    while stack:
+        node, children_visited = stack.pop()
+        if children_visited:
+            yield node
+            continue
+        stack.append((node, True))
+        if node.rightChild:
+            stack.append((node.rightChild, False))
+        if node.leftChild:
+            stack.append((node.leftChild, False))
+
 def postorder_traversal_draw(tree, digraph):
-    if tree:
-        if tree.leftChild:
-            digraph.edge(str(id(tree)), str(id(tree.leftChild)))
-            postorder_traversal_draw(tree.leftChild, digraph)
-        if tree.rightChild:
-            digraph.edge(str(id(tree)), str(id(tree.rightChild)))
-            postorder_traversal_draw(tree.rightChild, digraph)
-        digraph.node(str(id(tree)), str(tree.key))
-    else:
-        return
+    # same drawing order as the recursive version: edge to the left child, left subtree,
+    # edge to the right child, right subtree and finally the node itself
+    stack = [('visit', tree, None)] if tree else []
+    while stack:
+        action, node, child = stack.pop()
+        if action == 'edge':
+            digraph.edge(str(id(node)), str(id(child)))
+        elif action == 'node':
+            digraph.node(str(id(node)), str(node.key))
+        else:
+            stack.append(('node', node, None))
+            if node.rightChild:
+                stack.append(('visit', node.rightChild, None))
+                stack.append(('edge', node, node.rightChild))
+            if node.leftChild:
+                stack.append(('visit', node.leftChild, None))
+                stack.append(('edge', node, node.leftChild))
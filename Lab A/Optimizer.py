@@ -0,0 +1,239 @@
+# Created by: José Hurtarte
+# Created on: 11/03/2023
+# Last modified on: 15/03/2023
+# Description: NFA reduction passes, ε-transition elimination, pruning and merging of equivalent states
+
+from Automata import Automata, EPSILON, EMPTY_STATES
+
+# work allowed to eliminate_epsilon by reduce_automata, per state and edge of the automata,
+# small automata always get at least MIN_ELIMINATION_WORK steps
+MAX_ELIMINATION_GROWTH = 8
+MIN_ELIMINATION_WORK = 100000
+
+
+# the accepting rule of a set of final states, lower rule ids have priority (None outside tokenizer automata)
+def accepted_rule(automata, final_states):
+    rules = [automata.final_rules[state] for state in final_states if state in automata.final_rules]
+    return min(rules) if rules else None
+
+# builds an automata with the given states renumbered from 0 (the initial state) in order,
+# edges is a state -> {symbol: set of next states} index over the old numbering
+def renumber_automata(automata, states, edges, final_states, final_rules):
+    state_ids = {state: new_state for new_state, state in enumerate(states)}
+    alphabet = {symbol for state in states for symbol in edges.get(state, {})}
+    renumbered = Automata(list(range(len(states))), alphabet, [], 0, [state_ids[state] for state in states if state in final_states])
+    for state in states:
+        for symbol, next_states in edges.get(state, {}).items():
+            for next_state in next_states:
+                if next_state in state_ids:
+                    renumbered.add_transition(state_ids[state], symbol, state_ids[next_state])
+    for state, rule in final_rules.items():
+        if state in state_ids:
+            renumbered.final_rules[state_ids[state]] = rule
+    return renumbered
+
+# an ε-only state (not final, no symbol edge, a single ε-edge) adds nothing to a closure, so a chain of them
+# is skipped at once, like the final states of a long | chain. Returns the state after the chain (None when the
+# chain loops into itself), skipped remembers the answer for every state of the chain
+def skip_epsilon_chain(automata, state, final_states, skipped):
+    chain = []
+    in_chain = set()
+    while state not in final_states and not automata.delta.get(state) and len(automata.epsilon.get(state, EMPTY_STATES)) == 1:
+        if state in skipped:
+            state = skipped[state]
+            break
+        if state in in_chain:
+            state = None
+            break
+        chain.append(state)
+        in_chain.add(state)
+        state = next(iter(automata.epsilon[state]))
+    for chain_state in chain:
+        skipped[chain_state] = state
+    return state
+
+# only the initial state and the states entered by a symbol are kept, each of them gets the symbol edges
+# of its whole ε-closure and becomes final when its closure reaches a final state. Closures are walked
+# without being memoized, so their states are not kept around, and ε-only chains are skipped.
+# Returns None when the walks take more than max_work steps: closures shared by many states (a starred
+# alternation of many words) make the ε-free automata quadratic in size
+def eliminate_epsilon(automata, max_work=None):
+    final_states = frozenset(automata.final_states)
+    entered = {next_state for edges in automata.delta.values() for next_states in edges.values() for next_state in next_states}
+    kept = [state for state in automata.states if state == automata.initial_state or state in entered]
+    kept.sort(key=lambda state: state != automata.initial_state)
+    edges = {}
+    new_final_states = set()
+    final_rules = {}
+    skipped = {}
+    work = 0
+    for state in kept:
+        state_edges = {}
+        reached_final_states = []
+        visited = {state}
+        pending = [state]
+        while pending:
+            closure_state = pending.pop()
+            work += 1
+            if max_work is not None and work > max_work:
+                return None
+            if closure_state in final_states:
+                reached_final_states.append(closure_state)
+            for symbol, next_states in automata.delta.get(closure_state, {}).items():
+                state_edges.setdefault(symbol, set()).update(next_states)
+                work += len(next_states)
+            for next_state in automata.epsilon.get(closure_state, EMPTY_STATES):
+                next_state = skip_epsilon_chain(automata, next_state, final_states, skipped)
+                if next_state is not None and next_state not in visited:
+                    visited.add(next_state)
+                    pending.append(next_state)
+        edges[state] = state_edges
+        if reached_final_states:
+            new_final_states.add(state)
+            rule = accepted_rule(automata, reached_final_states)
+            if rule is not None:
+                final_rules[state] = rule
+    return renumber_automata(automata, kept, edges, new_final_states, final_rules)
+
+# removes the states that cannot be reached from the initial state or cannot reach a final state
+def prune_automata(automata):
+    reachable = {automata.initial_state}
+    pending = [automata.initial_state]
+    while pending:
+        for _, next_state in automata.edges(pending.pop()):
+            if next_state not in reachable:
+                reachable.add(next_state)
+                pending.append(next_state)
+    previous_states = {}
+    for state in reachable:
+        for _, next_state in automata.edges(state):
+            previous_states.setdefault(next_state, set()).add(state)
+    productive = {state for state in automata.final_states if state in reachable}
+    pending = list(productive)
+    while pending:
+        for previous_state in previous_states.get(pending.pop(), EMPTY_STATES):
+            if previous_state not in productive:
+                productive.add(previous_state)
+                pending.append(previous_state)
+    # the initial state is always kept, an automata for the empty language is left with just that state
+    kept = [automata.initial_state] + [state for state in automata.states if state in productive and state != automata.initial_state]
+    edges = {state: {symbol: automata.next_states(state, symbol) for symbol in automata.delta.get(state, {})} for state in kept}
+    for state, next_states in automata.epsilon.items():
+        if state in edges:
+            edges[state][EPSILON] = next_states
+    return renumber_automata(automata, kept, edges, set(automata.final_states), automata.final_rules)
+
+# strongly connected components over every edge (ε included) with an iterative Tarjan search,
+# components are returned successors first, that is in reverse topological order
+def strongly_connected_components(automata):
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in automata.states:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, automata.edges(root))]
+        while work:
+            state, edges = work[-1]
+            for _, next_state in edges:
+                if next_state not in index:
+                    index[next_state] = lowlink[next_state] = len(index)
+                    stack.append(next_state)
+                    on_stack.add(next_state)
+                    work.append((next_state, automata.edges(next_state)))
+                    break
+                if next_state in on_stack:
+                    lowlink[state] = min(lowlink[state], index[next_state])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[state])
+                if lowlink[state] == index[state]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == state:
+                            break
+                    components.append(component)
+    return components
+
+# states with the same finality, rule and outgoing edges accept the same suffixes, so they are merged.
+# One backward pass: states are hash-consed component by component in reverse topological order, so the
+# successors of a state outside its component already stand for their whole class and shared suffixes
+# of any length are merged at once. Inside a cycle merging can make more states equal, so a cyclic component
+# is hash-consed again until it is stable, which only costs rounds over that component.
+def merge_equivalent_states(automata):
+    final_states = set(automata.final_states)
+    representatives = {}
+    signatures = {}
+
+    def representative_of(state):
+        representative = representatives.get(state, state)
+        while representatives.get(representative, representative) != representative:
+            representative = representatives[representative]
+        return representative
+
+    def signature_of(state):
+        outgoing = frozenset((symbol, representative_of(next_state)) for symbol, next_state in automata.edges(state))
+        return (state in final_states, automata.final_rules.get(state), outgoing)
+
+    for component in strongly_connected_components(automata):
+        state = component[0]
+        if len(component) == 1 and all(next_state != state for _, next_state in automata.edges(state)):
+            representatives[state] = signatures.setdefault(signature_of(state), state)
+            continue
+        # a cyclic component has edges into itself, so none of its states equals a state seen before it
+        for state in component:
+            representatives[state] = state
+        members = component
+        while True:
+            local_signatures = {}
+            for state in members:
+                representatives[state] = local_signatures.setdefault(signature_of(state), state)
+            kept_members = [state for state in members if representatives[state] == state]
+            if len(kept_members) == len(members):
+                break
+            members = kept_members
+        for state in component:
+            representatives[state] = representative_of(state)
+        # its predecessors can still equal one of its states
+        for state in members:
+            signatures.setdefault(signature_of(state), state)
+    # the initial state stands for its own class
+    initial_representative = representatives[automata.initial_state]
+    if initial_representative != automata.initial_state:
+        for state, representative in representatives.items():
+            if representative == initial_representative:
+                representatives[state] = automata.initial_state
+    kept = [automata.initial_state] + [state for state in automata.states
+                                       if representatives[state] == state and state != automata.initial_state]
+    if len(kept) == len(automata.states):
+        return automata
+    edges = {}
+    for state in kept:
+        state_edges = {}
+        for symbol, next_state in automata.edges(state):
+            state_edges.setdefault(symbol, set()).add(representatives[next_state])
+        edges[state] = state_edges
+    return renumber_automata(automata, kept, edges, final_states, automata.final_rules)
+
+# ε-free, trimmed and merged automata recognizing the same language (final_rules are kept for tokenizers).
+# When removing the ε-edges would take more than max_growth steps per state and edge of the automata
+# the ε-NFA is only trimmed and merged, so the reduction stays linear in the size of the automata.
+# max_growth=None always removes them
+def reduce_automata(automata, max_growth=MAX_ELIMINATION_GROWTH):
+    max_work = None
+    if max_growth is not None:
+        max_work = max(MIN_ELIMINATION_WORK, max_growth * (len(automata.states) + automata.transition_count()))
+    eliminated = eliminate_epsilon(automata, max_work)
+    if eliminated is None:
+        eliminated = automata
+    return merge_equivalent_states(prune_automata(eliminated))
@@ -0,0 +1,142 @@
+# Created by: José Hurtarte
+# Created on: 10/03/2023
+# Last modified on: 15/03/2023
+# Description: Instrumentation hooks for the compile pipeline, automata metrics and match statistics
+
+import time
+import tracemalloc
+
+from DFA import DEAD_STATE, START_STATE
+
+# callables receiving (event, data), profiling only happens while at least one hook is registered
+hooks = []
+
+
+def add_hook(hook):
+    hooks.append(hook)
+
+def remove_hook(hook):
+    hooks.remove(hook)
+
+def emit(event, data):
+    for hook in hooks:
+        hook(event, data)
+
+# states of automata and DFAs, nodes of trees, tokens of postfix lists. (postfix, automata) pairs count the automata
+# and stages producing nothing, a cache miss or a cache store, have size 0
+def output_size(result):
+    if result is None:
+        return 0
+    if isinstance(result, tuple):
+        return output_size(result[-1])
+    if hasattr(result, 'state_count'):
+        return result.state_count
+    if hasattr(result, 'states'):
+        return len(result.states)
+    if hasattr(result, 'leftChild'):
+        count = 0
+        stack = [result]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(child for child in (node.leftChild, node.rightChild) if child)
+        return count
+    if hasattr(result, '__len__'):
+        return len(result)
+    return None
+
+# runs function(*arguments) as a pipeline stage, without hooks it is a plain call
+def run_stage(name, function, *arguments):
+    if not hooks:
+        return function(*arguments)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        result = function(*arguments)
+    finally:
+        elapsed = time.perf_counter() - start
+        memory_after, memory_peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+    emit('stage', {
+        'stage': name,
+        'seconds': elapsed,
+        'allocated_bytes': memory_after - memory_before,
+        'peak_bytes': memory_peak - memory_before,
+        'output_size': output_size(result),
+    })
+    return result
+
+def automata_metrics(automata):
+    transitions = automata.transition_count()
+    epsilon_edges = sum(len(next_states) for next_states in automata.epsilon.values())
+    return {
+        'states': len(automata.states),
+        'transitions': transitions,
+        'epsilon_edges': epsilon_edges,
+        'epsilon_ratio': epsilon_edges / transitions if transitions else 0.0,
+        'max_epsilon_closure': max((len(automata.epsilon_closure(state)) for state in automata.states), default=0),
+    }
+
+# runs a full match of text on an Automata, a LazyDFA or a CompactDFA counting the work done,
+# the engines themselves stay uninstrumented so normal matching pays nothing for this
+def match_metrics(engine, text):
+    scanned = 0
+    visited = 0
+    distinct = set()
+    start = time.perf_counter()
+    if hasattr(engine, 'table'):
+        state = START_STATE
+        for character in text:
+            state = engine.next_state(state, character)
+            scanned += 1
+            visited += 1
+            distinct.add(state)
+            if state == DEAD_STATE:
+                break
+        matched = state != DEAD_STATE and bool(engine.is_final(state))
+        cache = None
+    elif hasattr(engine, 'cache'):
+        engine.reset_stats()
+        states = None
+        for states in engine.run(text):
+            visited += 1
+            distinct.add(states)
+        scanned = visited - 1
+        matched = scanned == len(text) and engine.is_final(states)
+        cache = engine.stats()
+    else:
+        states = engine.epsilon_closure(engine.initial_state)
+        visited += len(states)
+        for character in text:
+            states = engine.step(states, character)
+            scanned += 1
+            visited += len(states)
+            distinct.update(states)
+            if not states:
+                break
+        matched = scanned == len(text) and not frozenset(engine.final_states).isdisjoint(states)
+        cache = {'closures': len(engine.closures)}
+    metrics = {
+        'engine': type(engine).__name__,
+        'matched': matched,
+        'seconds': time.perf_counter() - start,
+        'characters_scanned': scanned,
+        'states_visited': visited,
+        'distinct_states': len(distinct),
+        'cache': cache,
+    }
+    emit('match', metrics)
+    return metrics
+
+# hook printing every event in a readable form, used by the --profile option
+def print_hook(event, data):
+    if event == 'stage':
+        print('[profile] {:<20} {:>10.3f} ms {:>12} B allocated {:>12} B peak   output size {}'.format(
+            data['stage'], data['seconds'] * 1000, data['allocated_bytes'], data['peak_bytes'], data['output_size']))
+    else:
+        print('[profile] {} {}'.format(event, data))
@@ -0,0 +1,178 @@
+# Created by: José Hurtarte
+# Created on: 07/03/2023
+# Last modified on: 15/03/2023
+# Description: Single pass front-end, validates an infix regular expression and converts it to postfix
+
+from CharClass import ANY, CharSet, ESCAPE_SETS, MAX_CODEPOINT
+
+UNARY_OPERATORS = frozenset('*+?')
+PRECEDENCE = {'|': 1, '.': 2}
+# characters with a meaning of their own in the postfix, written literally they become one character sets
+POSTFIX_SYMBOLS = frozenset('|.*+?ε')
+ESCAPE_CHARACTERS = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+# \xHH, \uHHHH and \UHHHHHHHH are the character with that codepoint, the form CharClass uses to print characters
+CODEPOINT_ESCAPES = {'x': 2, 'u': 4, 'U': 8}
+HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+
+class RegexError(ValueError):
+    def __init__(self, message, position=None):
+        if position is None:
+            super().__init__('Invalid input: {}'.format(message))
+        else:
+            super().__init__('Invalid input: {}, error at position: {}'.format(message, position))
+        self.message = message
+        self.position = position
+
+
+# one left to right scan that skips whitespace, validates, inserts the implicit concatenations
+# and runs the shunting yard algorithm at the same time, unary operators go straight to the output
+# because they have the highest precedence. Positions in the errors refer to the original input.
+# Operands are single characters or CharSets for [...] classes, \d \w \s escapes (and their negations)
+# and the . wildcard, escaped characters are literals (\. \| \( \  and so on).
+def parse_regex(user_input):
+    output = []
+    # operator stack entries are (operator, position), '(' included
+    operator_stack = []
+    open_parenthesis = 0
+    # True while an operand (or an opening parenthesis) is required next
+    expect_operand = True
+    previous = None
+    next_position = 0
+    while next_position < len(user_input):
+        position = next_position
+        token = user_input[position]
+        next_position += 1
+        if token == ' ':
+            continue
+        if token in UNARY_OPERATORS or token == '|':
+            if expect_operand:
+                if previous is None:
+                    raise RegexError('Symbols at start are not a valid operation', position)
+                if previous == '(':
+                    raise RegexError('Operators after open parenthesis are not a valid operation', position)
+                if previous == '|' and token == '|':
+                    raise RegexError('Two or more consecutive |', position)
+                raise RegexError('Operand missing before {}'.format(token), position)
+            if token == '|':
+                push_operator(output, operator_stack, token, position)
+                expect_operand = True
+            else:
+                output.append(token)
+        elif token == '(':
+            if not expect_operand:
+                push_operator(output, operator_stack, '.', position)
+            operator_stack.append(('(', position))
+            open_parenthesis += 1
+            expect_operand = True
+        elif token == ')':
+            if not open_parenthesis:
+                raise RegexError('Mismatched parenthesis, cannot close a parenthesis that was not opened', position)
+            if previous == '(':
+                raise RegexError('Empty parenthesis', position)
+            if expect_operand:
+                raise RegexError('Second of operation misssing', position)
+            while operator_stack[-1][0] != '(':
+                output.append(operator_stack.pop()[0])
+            operator_stack.pop()
+            open_parenthesis -= 1
+        else:
+            if not expect_operand:
+                push_operator(output, operator_stack, '.', position)
+            operand, next_position = read_operand(user_input, position)
+            output.append(operand)
+            expect_operand = False
+        previous = token
+    if previous is None:
+        raise RegexError('Empty input')
+    if expect_operand:
+        raise RegexError('Symbol at end not valid', len(user_input.rstrip(' ')) - 1)
+    while operator_stack:
+        operator, position = operator_stack.pop()
+        if operator == '(':
+            raise RegexError('Parenthesis mismatch error, close all parenthesis to fix it', position)
+        output.append(operator)
+    return output
+
+# returns the operand starting at position and the position after it
+def read_operand(user_input, position):
+    token = user_input[position]
+    if token == '[':
+        return read_class(user_input, position)
+    if token == '.':
+        return ANY, position + 1
+    if token == '\\':
+        operand, next_position = read_escape(user_input, position)
+        return (operand if isinstance(operand, CharSet) else literal_operand(operand)), next_position
+    return token, position + 1
+
+# single characters stay plain operands unless the postfix gives them another meaning
+def literal_operand(character):
+    if character in POSTFIX_SYMBOLS:
+        return CharSet.single(character)
+    return character
+
+# escape starting at the backslash in position, returns (character or CharSet, position after it)
+def read_escape(user_input, position):
+    if position + 1 >= len(user_input):
+        raise RegexError('Escape at end of input', position)
+    escaped = user_input[position + 1]
+    if escaped in ESCAPE_SETS:
+        return ESCAPE_SETS[escaped], position + 2
+    if escaped in CODEPOINT_ESCAPES:
+        digits = user_input[position + 2:position + 2 + CODEPOINT_ESCAPES[escaped]]
+        if len(digits) != CODEPOINT_ESCAPES[escaped] or not HEX_DIGITS.issuperset(digits):
+            raise RegexError('Expected {} hexadecimal digits after \\{}'.format(CODEPOINT_ESCAPES[escaped], escaped), position)
+        if int(digits, 16) > MAX_CODEPOINT:
+            raise RegexError('Codepoint out of range \\{}{}'.format(escaped, digits), position)
+        return chr(int(digits, 16)), position + 2 + len(digits)
+    return ESCAPE_CHARACTERS.get(escaped, escaped), position + 2
+
+# [...] class starting at position: characters, low-high ranges and escapes, [^...] is the complement.
+# Spaces inside a class are literal, a - at the start or the end of the class is a literal too
+def read_class(user_input, position):
+    start = position
+    position += 1
+    negated = position < len(user_input) and user_input[position] == '^'
+    if negated:
+        position += 1
+    ranges = []
+    while position < len(user_input) and user_input[position] != ']':
+        item_position = position
+        if user_input[position] == '\\':
+            low, position = read_escape(user_input, position)
+        else:
+            low, position = user_input[position], position + 1
+        if isinstance(low, CharSet):
+            ranges.extend(low.ranges)
+            continue
+        if position + 1 < len(user_input) and user_input[position] == '-' and user_input[position + 1] != ']':
+            if user_input[position + 1] == '\\':
+                high, position = read_escape(user_input, position + 1)
+            else:
+                high, position = user_input[position + 1], position + 2
+            if isinstance(high, CharSet):
+                raise RegexError('Invalid range end {}'.format(high), item_position)
+            if ord(high) < ord(low):
+                raise RegexError('Invalid range {}-{}'.format(low, high), item_position)
+            ranges.append((ord(low), ord(high)))
+        else:
+            ranges.append((ord(low), ord(low)))
+    if position >= len(user_input):
+        raise RegexError('Character class not closed', start)
+    if not ranges:
+        raise RegexError('Empty character class', start)
+    char_set = CharSet(ranges)
+    if negated:
+        char_set = char_set.negate()
+        if not char_set.ranges:
+            raise RegexError('Character class without characters', start)
+    # classes of one character are plain operands
+    if len(char_set.ranges) == 1 and char_set.ranges[0][0] == char_set.ranges[0][1]:
+        return literal_operand(chr(char_set.ranges[0][0])), position + 1
+    return char_set, position + 1
+
+def push_operator(output, operator_stack, operator, position):
+    while operator_stack and operator_stack[-1][0] != '(' and PRECEDENCE[operator] <= PRECEDENCE[operator_stack[-1][0]]:
+        output.append(operator_stack.pop()[0])
+    operator_stack.append((operator, position))
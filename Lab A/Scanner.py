@@ -0,0 +1,131 @@
+# Created by: José Hurtarte
+# Created on: 04/03/2023
+# Last modified on: 14/03/2023
+# Description: Streaming scanner over chunked input (file objects, chunk generators and mmap-ed files)
+
+import codecs
+from contextlib import contextmanager
+import mmap
+import os
+
+from Automata import EMPTY_STATES
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+# decodes any supported source into a stream of str chunks, bytes are decoded incrementally
+# so multi-byte characters split between two chunks are kept whole
+def read_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8'):
+    if isinstance(source, mmap.mmap):
+        chunks = (source[start:start + chunk_size] for start in range(0, len(source), chunk_size))
+    elif hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = source
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        if not isinstance(chunk, str):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+# maps the whole file read only, empty files cannot be mapped so they are read as a plain file
+@contextmanager
+def open_mapped(path):
+    with open(path, 'rb') as input_file:
+        if os.fstat(input_file.fileno()).st_size == 0:
+            yield input_file
+            return
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            yield mapped_file
+
+
+class ChunkBuffer:
+    # sliding window over a stream of chunks addressed with absolute positions,
+    # only the text from the last released position onwards is kept in memory
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.text = ''
+        self.offset = 0
+        self.kept = 0
+        self.exhausted = False
+
+    # loads chunks until position is buffered, False when the stream ends before it
+    def has(self, position):
+        while position >= self.offset + len(self.text):
+            if self.exhausted:
+                return False
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                return False
+            self.text = self.text[self.kept - self.offset:] + chunk
+            self.offset = self.kept
+        return True
+
+    def char(self, position):
+        return self.text[position - self.offset]
+
+    def slice(self, start, end):
+        return self.text[start - self.offset:end - self.offset]
+
+    # text before position is no longer needed, it is dropped on the next load
+    def release(self, position):
+        self.kept = max(self.kept, position)
+
+
+# leftmost-longest search over a stream, yields (start, end, value) for every non empty, non overlapping match
+# all start positions are simulated together like Automata.search, the buffer only keeps the text from the
+# earliest live start so memory stays bounded by the chunk size plus the longest in-flight match
+def scan_matches(automata, chunks):
+    final_states = frozenset(automata.final_states)
+    initial_closure = automata.epsilon_closure(automata.initial_state)
+    buffer = ChunkBuffer(chunks)
+    position = 0
+    threads = {}
+    best = None
+    while True:
+        if not buffer.has(position):
+            if best is None:
+                return
+            # the stream ended while the longest match was still growing
+            start, end = best
+            yield start, end, buffer.slice(start, end)
+            position = end
+            threads = {}
+            best = None
+            continue
+        if best is None:
+            for state in initial_closure:
+                threads.setdefault(state, position)
+        character = buffer.char(position)
+        next_threads = {}
+        symbol_class = automata.symbol_class(character)
+        for state, start in threads.items():
+            edges = automata.delta.get(state, {})
+            for label in symbol_class:
+                for next_state in edges.get(label, EMPTY_STATES):
+                    for closure_state in automata.epsilon_closure(next_state):
+                        next_threads.setdefault(closure_state, start)
+        threads = next_threads
+        position += 1
+        # threads keep insertion order, so starts are non decreasing
+        for state, start in threads.items():
+            if state in final_states:
+                if best is None or start <= best[0]:
+                    best = (start, position)
+                break
+        if best is not None:
+            threads = {state: start for state, start in threads.items() if start <= best[0]}
+            if not threads:
+                start, end = best
+                yield start, end, buffer.slice(start, end)
+                position = end
+                best = None
+        if threads:
+            buffer.release(next(iter(threads.values())))
+        else:
+            buffer.release(position)
@@ -0,0 +1,97 @@
+# Created by: José Hurtarte
+# Created on: 03/03/2023
+# Last modified on: 15/03/2023
+# Description: Multi-rule tokenizer over a single combined automaton
+
+from collections import OrderedDict, namedtuple
+
+from Automata import tokens_automata
+from CharClass import CharSet
+from DFA import LazyDFA
+from Optimizer import reduce_automata
+from Scanner import ChunkBuffer
+
+Token = namedtuple('Token', ['name', 'value', 'start'])
+
+
+class TokenizeError(ValueError):
+    def __init__(self, message, position):
+        super().__init__('{}, error at position: {}'.format(message, position))
+        self.position = position
+
+
+class Tokenizer:
+    # rules is an ordered list of (token_name, postfix_expression), earlier rules have higher priority.
+    # Characters in ignore (a string of characters or a CharSet) are skipped between tokens
+    def __init__(self, rules, ignore='', cache_size=4096):
+        self.names = [name for name, _ in rules]
+        # the combined automata is ε-heavy, it is reduced once so every DFA state is cheaper to build
+        self.automata = reduce_automata(tokens_automata([postfix for _, postfix in rules]))
+        self.dfa = LazyDFA(self.automata, cache_size)
+        self.ignore = ignore if isinstance(ignore, CharSet) else frozenset(ignore)
+        # DFA state -> rule accepted in that state, None when it does not accept. Bounded like the DFA cache,
+        # the oldest entries are dropped first
+        self.accepted_rules = OrderedDict()
+        # DFA steps and evictions of the current stream, the stream falls back to NFA simulation when the cache thrashes
+        self.steps = 0
+        self.initial_evictions = 0
+        self.use_nfa = False
+
+    def accepted_rule(self, states):
+        if states in self.accepted_rules:
+            return self.accepted_rules[states]
+        final_rules = self.automata.final_rules
+        rules = [final_rules[state] for state in states if state in final_rules]
+        rule = min(rules) if rules else None
+        self.accepted_rules[states] = rule
+        if len(self.accepted_rules) > self.dfa.cache_size:
+            self.accepted_rules.popitem(last=False)
+        return rule
+
+    def step(self, states, character):
+        if self.use_nfa:
+            return self.automata.step_class(states, self.automata.symbol_class(character))
+        states = self.dfa.transition(states, character)
+        self.steps += 1
+        if self.dfa.is_thrashing(self.steps, self.dfa.evictions - self.initial_evictions):
+            self.dfa.fallbacks += 1
+            self.use_nfa = True
+        return states
+
+    # maximal munch: the longest lexeme wins, ties go to the rule with the highest priority
+    # returns (end, rule) of the longest non empty token starting at pos, None if there is none
+    def longest_token(self, buffer, pos):
+        longest = None
+        states = self.dfa.initial_state
+        end = pos
+        while buffer.has(end):
+            states = self.step(states, buffer.char(end))
+            end += 1
+            if not states:
+                break
+            rule = self.accepted_rule(states)
+            if rule is not None:
+                longest = (end, rule)
+        return longest
+
+    def tokenize(self, text):
+        return self.tokenize_chunks((text,))
+
+    # tokens are yielded as soon as they are complete, tokens split between chunks are joined in the buffer
+    def tokenize_chunks(self, chunks):
+        buffer = ChunkBuffer(chunks)
+        pos = 0
+        self.steps = 0
+        self.initial_evictions = self.dfa.evictions
+        self.use_nfa = False
+        while buffer.has(pos):
+            buffer.release(pos)
+            if buffer.char(pos) in self.ignore:
+                pos += 1
+                continue
+            longest = self.longest_token(buffer, pos)
+            if longest is None:
+                raise TokenizeError('Invalid input: No token rule matches {!r}'.format(buffer.char(pos)), pos)
+            end, rule = longest
+            yield Token(self.names[rule], buffer.slice(pos, end), pos)
+            pos = end
@@ -0,0 +1,207 @@
+# Created by: José Hurtarte
+# Created on: 06/03/2023
+# Last modified on: 15/03/2023
+# Description: Benchmarks for the regex -> automata pipeline
+
+# usage: python benchmark.py [stages|construction] [MAX_SIZE] [--threshold EXPONENT] [--budget SECONDS]
+# every measurement is printed as one JSON record, the stages suite ends with one scaling record
+# per (family, stage) that flags the stages growing faster than the threshold exponent.
+# The stages listed in long_stages also run on their family up to LONG_SIZE symbols, whatever MAX_SIZE is,
+# so the scaling check covers the backends meant for large patterns at sizes where a quadratic cost shows.
+# A stage slower than the budget is not run on the larger sizes of that family (nor the stages using its result),
+# eager DFA construction is exponential on some families.
+
+import contextlib
+import gc
+import io
+import json
+import math
+import sys
+import time
+import tracemalloc
+
+from Automata import build_automata, embellish_automata
+from DFA import LazyDFA, compile_dfa
+from DirectDFA import compile_direct_dfa
+from Optimizer import reduce_automata
+from ExpressionTree import build_tree
+from RegexParser import parse_regex
+from lexer import clean_input, validate_input, validate_input_naive, format_input, shunting_yard, pop_option
+
+# postfix expressions of n operands, generated directly so only the construction is measured
+def concatenation_postfix(size):
+    return ['a'] + ['b', '.'] * (size - 1)
+
+def alternation_postfix(size):
+    return ['a'] + ['b', '|'] * (size - 1)
+
+def nested_plus_postfix(size):
+    return ['a'] + ['+'] * (size - 1)
+
+def starred_concatenation_postfix(size):
+    return ['a'] + ['b', '.', '*'] * (size - 1)
+
+construction_families = {
+    'concatenation': concatenation_postfix,
+    'alternation': alternation_postfix,
+    'nested plus': nested_plus_postfix,
+    'starred concatenation': starred_concatenation_postfix,
+}
+
+# infix pattern families of about n symbols with a text the pattern matches entirely
+def long_concatenation(size):
+    pattern = ''.join('abcdefgh'[i % 8] for i in range(size))
+    return pattern, pattern
+
+def deep_nesting(size):
+    depth = max(1, size // 3)
+    return '(a' * depth + ')' * depth, 'a' * depth
+
+def wide_alternation(size):
+    count = max(1, size // 2)
+    return '|'.join('abcdefgh'[i % 8] for i in range(count)), 'h' if count >= 8 else 'a'
+
+def chained_closures(size):
+    count = max(1, size // 4)
+    return 'a+b?' * count, 'ab' * count
+
+def character_classes(size):
+    count = max(1, size // 11)
+    return '[a-z]+[0-9]' * count, 'ab1' * count
+
+pattern_families = {
+    'long concatenation': long_concatenation,
+    'deep nesting': deep_nesting,
+    'wide alternation': wide_alternation,
+    'chained closures': chained_closures,
+    'character classes': character_classes,
+}
+
+# family -> stages measured up to LONG_SIZE, every stage needs the stage giving its input in the same set
+LONG_SIZE = 100000
+long_stages = {
+    'long concatenation': {'parse_regex', 'direct_dfa'},
+}
+
+# the garbage collector is paused like timeit does, its passes grow with the live objects
+# fast stages are looped until they take a measurable time, the best of the repeats is kept
+def measure_time(function, argument, repeat=3, minimum_time=0.01):
+    best = None
+    loops = 1
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(loops):
+                result = function(argument)
+            elapsed = (time.perf_counter() - start) / loops
+        finally:
+            gc.enable()
+        if elapsed * loops < minimum_time:
+            loops = min(1000, math.ceil(minimum_time / max(elapsed, 1e-7)))
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def measure_memory(function, argument):
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def quiet(function):
+    # the legacy validators print their errors, they are muted so the output stays machine readable
+    def run(argument):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(argument)
+    return run
+
+# stage name -> (function, name of the stage whose result is its input)
+def pipeline_stages(text):
+    return {
+        'clean_input': (clean_input, 'pattern'),
+        'validate_input': (quiet(validate_input), 'pattern'),
+        'validate_input_naive': (quiet(validate_input_naive), 'clean_input'),
+        'format_input': (format_input, 'clean_input'),
+        'shunting_yard': (shunting_yard, 'format_input'),
+        'parse_regex': (parse_regex, 'pattern'),
+        'build_tree': (build_tree, 'parse_regex'),
+        'build_automata': (build_automata, 'parse_regex'),
+        'embellish_automata': (embellish_automata, 'build_automata'),
+        'reduce_automata': (reduce_automata, 'build_automata'),
+        'compile_dfa': (compile_dfa, 'build_automata'),
+        'direct_dfa': (compile_direct_dfa, 'parse_regex'),
+        'nfa_fullmatch': (lambda automata: automata.fullmatch(text), 'build_automata'),
+        'reduced_nfa_fullmatch': (lambda automata: automata.fullmatch(text), 'reduce_automata'),
+        'lazy_dfa_fullmatch': (lambda automata: LazyDFA(automata).fullmatch(text), 'build_automata'),
+        'compact_dfa_fullmatch': (lambda dfa: dfa.fullmatch(text), 'compile_dfa'),
+        'direct_dfa_fullmatch': (lambda dfa: dfa.fullmatch(text), 'direct_dfa'),
+    }
+
+def benchmark_stages(sizes, threshold, budget):
+    timings = {}
+    for family, pattern_generator in pattern_families.items():
+        over_budget = set()
+        family_sizes = list(sizes)
+        if family in long_stages and family_sizes:
+            while family_sizes[-1] < LONG_SIZE:
+                family_sizes.append(family_sizes[-1] * 10)
+        for size in family_sizes:
+            pattern, text = pattern_generator(size)
+            results = {'pattern': pattern}
+            for stage, (function, source) in pipeline_stages(text).items():
+                if size > sizes[-1] and stage not in long_stages[family]:
+                    continue
+                if stage in over_budget or source in over_budget:
+                    over_budget.add(stage)
+                    print(json.dumps({'suite': 'stages', 'family': family, 'stage': stage, 'size': len(pattern),
+                                      'skipped': True}))
+                    continue
+                seconds, results[stage] = measure_time(function, results[source])
+                if seconds > budget:
+                    over_budget.add(stage)
+                record = {'suite': 'stages', 'family': family, 'stage': stage, 'size': len(pattern),
+                          'seconds': seconds, 'peak_bytes': measure_memory(function, results[source])}
+                timings.setdefault((family, stage), []).append((len(pattern), seconds))
+                print(json.dumps(record))
+    # empirical exponent of the two largest sizes, 1 is linear and 2 quadratic
+    for (family, stage), points in timings.items():
+        if len(points) < 2:
+            continue
+        (small_size, small_time), (large_size, large_time) = points[-2], points[-1]
+        exponent = math.log(max(large_time, 1e-9) / max(small_time, 1e-9)) / math.log(large_size / small_size)
+        print(json.dumps({'suite': 'scaling', 'family': family, 'stage': stage, 'exponent': round(exponent, 3),
+                          'regression': exponent > threshold}))
+
+# times build_automata for every family and size, the time per symbol stays flat when construction is linear
+def benchmark_construction(sizes):
+    for family, postfix_generator in construction_families.items():
+        for size in sizes:
+            postfix = postfix_generator(size)
+            seconds, automata = measure_time(build_automata, postfix, repeat=1)
+            print(json.dumps({'suite': 'construction', 'family': family, 'size': len(postfix),
+                              'states': len(automata.states), 'seconds': seconds,
+                              'us_per_symbol': seconds / len(postfix) * 1e6}))
+
+def main():
+    arguments = sys.argv[1:]
+    threshold = pop_option(arguments, '--threshold', 1.5, float)
+    budget = pop_option(arguments, '--budget', 1.0, float)
+    suite = arguments.pop(0) if arguments and not arguments[0].isdigit() else 'stages'
+    max_size = int(arguments[0]) if arguments else (100000 if suite == 'construction' else 10000)
+    sizes = []
+    size = 100
+    while size <= max_size:
+        sizes.append(size)
+        size *= 10
+    if suite == 'construction':
+        benchmark_construction(sizes)
+    elif suite == 'stages':
+        benchmark_stages(sizes, threshold, budget)
+    else:
+        print('Unknown suite {}, expected stages or construction'.format(suite))
+
+if __name__ == "__main__":
+    main()
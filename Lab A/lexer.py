@@ -1,14 +1,29 @@
 # Created by: José Hurtarte
 # Created on: 20/02/2023
-# Last modified on: 26/02/2023
+# Last modified on: 15/03/2023
 # Description: Lexer for an infix regular expression
 
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
 import sys
-from graphviz import Digraph
 import re
 
 from Automata import *
 from ExpressionTree import *
+from Tokenizer import Tokenizer, TokenizeError
+from Scanner import read_chunks, open_mapped, scan_matches
+from CompileCache import CompileCache
+from RegexParser import parse_regex, RegexError
+from CharClass import SPACE
+from Export import RenderQueue, export_files
+from DFA import LazyDFA, compile_dfa
+from Optimizer import reduce_automata
+from DirectDFA import compile_direct_dfa
+import Profiler
+
+# compiled patterns are also kept on disk when LEXER_CACHE_DIR is set
+compile_cache = CompileCache(os.environ.get('LEXER_CACHE_DIR'))
 
 # cleans the input from whitespaces
 # TODO: Modify to do this but with classes?
@@ -20,76 +35,28 @@ def clean_input(user_input):
 # TODO: Modify to do this but with classes?
 def format_input(user_input):
     symbols = ['|','*','+','?']
-    result = str()
+    result = []
     for i in range(len(user_input)):
         if (i != 0):
             #fist case we check if the previous character is a token and current character is a opening parenthesis
             if (user_input[i-1] not in symbols and user_input[i-1] != '('  and user_input[i] == '('):
-                result = result + '.' + user_input[i]
+                result.append('.' + user_input[i])
             #second case we check if the previous character is a * or + or ? and current character is a token
             elif (user_input[i-1] in symbols[1:] and user_input[i] not in symbols and user_input[i] != ')'):
-                result = result + '.' + user_input[i]
+                result.append('.' + user_input[i])
             #third case we check if the previous character is a closing parenthesis and current character is a token
             elif (user_input[i-1] == ')' and user_input[i] not in symbols and user_input[i] != '(' and user_input[i] != ')'):
-                result = result + '.' + user_input[i]
+                result.append('.' + user_input[i])
             #last check if previous character is not a symbol and not a parenthesis and current character is not a symbol and not a parenthesi
             elif (user_input[i-1] not in symbols and user_input[i-1] != '(' and user_input[i-1] != ')' and user_input[i] not in symbols and user_input[i] != '(' and user_input[i] != ')'):
-                result = result + '.' + user_input[i]
+                result.append('.' + user_input[i])
             else:
-                result= result + user_input[i]
+                result.append(user_input[i])
         else:
-            result = result + user_input[i]
-    return result
+            result.append(user_input[i])
+    return ''.join(result)
 
 
-def validate_input(user_input):
-    if (len(user_input) == 0):
-        print ('Invalid input: Empty input')
-        return False
-    if ('.' in user_input):
-        print ('Invalid input: . is a reserved character')
-        return False
-    two_ors_regex = re.search(r'\|\s*\|', user_input)
-    if (two_ors_regex):
-        print('Invalid input: Two or more consecutive |, error at position: {}'.format(two_ors_regex.start()))
-        return False
-    initial_symbol_regex = re.search(r'^\s*[*+?|.]', user_input)
-    if (initial_symbol_regex):
-        print('Invalid input: Symbols at start are not a valid operation, error at position: {}'.format(initial_symbol_regex.start()))
-        return False
-    final_symbol_regex = re.search(r'[\s]*[|.]$', user_input)
-    if (final_symbol_regex):
-        print('Invalid input: Symbol at end not valid, error at position: {}'.format(final_symbol_regex.start()))
-        return False
-    empty_parenthesis_regex = re.search(r'\(\s*\)', user_input)
-    if (empty_parenthesis_regex):
-        print('Invalid input: Empty parenthesis, error at position: {}'.format(empty_parenthesis_regex.start()))
-        return False
-    operator_open_parenthesis_regex = re.search(r'\(\s*[+*?|.]', user_input)
-    if (operator_open_parenthesis_regex):
-        print('Invalid input: Operators after open parenthesis are not a valid operation, error at position: {}'.format(operator_open_parenthesis_regex.start()))
-        return False
-    operator_closing_parenthesis_regex = re.search(r'[|.]\s*\)', user_input)
-    if (operator_closing_parenthesis_regex):
-        print('Invalid input: Second of operation misssing, error at position: {}'.format(operator_closing_parenthesis_regex.start()))
-        return False
-    
-    
-    
-    parenthesis_count = 0
-    for i in range(len(user_input)):
-        if (user_input[i] == '('):
-            parenthesis_count += 1
-        elif (user_input[i] == ')'):
-            parenthesis_count -= 1
-        if (parenthesis_count < 0):
-            print('Invalid input: Mismatched parenthesis, cannot close a parenthesis that was not opened, error at position: {}'.format(i))
-            return False
-    if (parenthesis_count != 0):
-        print('Invalid input: Parenthesis mismatch error, close all parenthesis to fix it')
-        return False
-    return True
-
 def validate_input(user_input):
     if (len(user_input) == 0):
         print ('Invalid input: Empty input')
@@ -183,34 +150,300 @@ def validate_input_naive(user_input):
     return True
 
 
+# runs the whole regex -> automata pipeline, returns (postfix, automata), raises RegexError if the expression is not valid
+# patterns found in the cache skip every stage, parsing included. The pattern is the cache key as written,
+# spaces are not removed from it because they are characters inside [...] classes and after a backslash
+def compile_regex(user_input, cache=compile_cache):
+    pattern = user_input
+    if cache is not None:
+        compiled = Profiler.run_stage('cache_lookup', cache.get, pattern)
+        if compiled is not None:
+            return compiled
+    postfix = Profiler.run_stage('parse_regex', parse_regex, user_input)
+    automata = Profiler.run_stage('build_automata', build_automata, postfix)
+    automata = Profiler.run_stage('embellish_automata', embellish_automata, automata)
+    if cache is not None:
+        Profiler.run_stage('cache_store', cache.put, pattern, postfix, automata)
+    return postfix, automata
+
+# later stage of the pattern ('reduced', 'dfa' or 'direct', see CompileCache.COMPILED_KINDS) from the cache,
+# build() only runs on a miss and its result is stored, so the reduction and the DFA constructions run once per pattern
+def compile_stage(user_input, kind, build, cache=compile_cache):
+    if cache is not None:
+        compiled = Profiler.run_stage('cache_lookup', cache.get_compiled, user_input, kind)
+        if compiled is not None:
+            return compiled
+    compiled = build()
+    if cache is not None:
+        Profiler.run_stage('cache_store', cache.put_compiled, user_input, kind, compiled)
+    return compiled
+
+def reduced_regex(user_input, cache=compile_cache):
+    def build():
+        postfix, automata = compile_regex(user_input, cache)
+        return Profiler.run_stage('reduce_automata', reduce_automata, automata)
+    return compile_stage(user_input, 'reduced', build, cache)
+
+# reads the token rules, one "TOKEN_NAME regex" per line, blank lines and lines starting with # are skipped
+def read_rules(path):
+    rules = []
+    with open(path, encoding='utf-8') as rules_file:
+        for line_number, line in enumerate(rules_file, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            rule = line.split(None, 1)
+            if len(rule) != 2:
+                print('Invalid rule at line {}: expected a token name and a regular expression'.format(line_number))
+                return None
+            rules.append((rule[0], rule[1]))
+    return rules
+
+# --ignore value, one character, escape or [...] class, the empty string ignores nothing.
+# A single character is taken literally (the parser would skip a lone space), so --ignore ' ' skips spaces
+def ignore_set(value):
+    if len(value) <= 1:
+        return value
+    postfix = parse_regex(value)
+    if len(postfix) != 1:
+        raise ValueError('--ignore expects one character, escape or class, got {}'.format(value))
+    return postfix[0]
+
+# usage: lexer.py tokenize RULES_FILE [INPUT_FILE] [--ignore CLASS], the input is read from the console when no file is given.
+# Characters of the --ignore class (\s by default) are skipped between tokens, with --ignore '' nothing is skipped
+# so a rule like WS \s+ gets its tokens
+def tokenize_main(arguments):
+    arguments = list(arguments)
+    try:
+        ignore = pop_option(arguments, '--ignore', SPACE, ignore_set)
+    except ValueError as error:
+        print(error)
+        return
+    if len(arguments) < 1:
+        print('Usage: lexer.py tokenize RULES_FILE [INPUT_FILE] [--ignore CLASS]')
+        return
+    try:
+        rules = read_rules(arguments[0])
+    except OSError as error:
+        print(error)
+        return
+    if not rules:
+        return
+    postfix_rules = []
+    for name, regex in rules:
+        try:
+            postfix_rules.append((name, parse_regex(regex)))
+        except RegexError as error:
+            print('Invalid rule {}: {}'.format(name, error))
+            return
+    tokenizer = Tokenizer(postfix_rules, ignore=ignore)
+    try:
+        if len(arguments) > 1:
+            with open_mapped(arguments[1]) as input_file:
+                for token in tokenizer.tokenize_chunks(read_chunks(input_file)):
+                    print('{} {!r} {}'.format(token.name, token.value, token.start))
+        else:
+            for token in tokenizer.tokenize_chunks(read_chunks(sys.stdin)):
+                print('{} {!r} {}'.format(token.name, token.value, token.start))
+    except (TokenizeError, OSError) as error:
+        print(error)
+
+# usage: lexer.py scan PATTERN [FILE], prints every match of the pattern as "start end value"
+def scan_main(arguments):
+    if len(arguments) < 1:
+        print('Usage: lexer.py scan PATTERN [FILE]')
+        return
+    try:
+        automata = reduced_regex(arguments[0])
+    except RegexError as error:
+        print(error)
+        return
+    try:
+        if len(arguments) > 1:
+            with open_mapped(arguments[1]) as input_file:
+                for start, end, value in scan_matches(automata, read_chunks(input_file)):
+                    print('{} {} {!r}'.format(start, end, value))
+        else:
+            for start, end, value in scan_matches(automata, read_chunks(sys.stdin)):
+                print('{} {} {!r}'.format(start, end, value))
+    except OSError as error:
+        print(error)
+
+# postfix as text, character sets are written back in their [...] or escape form
+def postfix_text(postfix):
+    return ''.join(str(token) for token in postfix)
+
+# removes "--name value" from the arguments, returns the value converted with convert or default when missing
+def pop_option(arguments, name, default, convert=int):
+    if name not in arguments:
+        return default
+    index = arguments.index(name)
+    if index + 1 >= len(arguments):
+        raise ValueError('Missing value for {}'.format(name))
+    value = arguments[index + 1]
+    del arguments[index:index + 2]
+    return convert(value)
+
+# compiles one batch line, runs in the worker processes so it only returns plain data
+def compile_record(numbered_pattern):
+    line_number, pattern = numbered_pattern
+    record = {'line': line_number, 'pattern': pattern, 'postfix': None, 'states': None, 'transitions': None,
+              'error': None, 'position': None}
+    try:
+        postfix, automata = compile_regex(pattern)
+    except RegexError as error:
+        record['error'] = error.message
+        record['position'] = error.position
+        return record
+    record['postfix'] = postfix_text(postfix)
+    record['states'] = len(automata.states)
+    record['transitions'] = automata.transition_count()
+    return record
+
+def read_patterns(lines):
+    for line_number, line in enumerate(lines, 1):
+        pattern = line.rstrip('\r\n')
+        if pattern.strip():
+            yield line_number, pattern
+
+# usage: lexer.py batch [PATTERNS_FILE] [--workers N] [--chunk-size N]
+# compiles one pattern per line (stdin when no file is given) and prints one JSON record per pattern, in input order
+def batch_main(arguments):
+    arguments = list(arguments)
+    try:
+        workers = pop_option(arguments, '--workers', None)
+        chunk_size = pop_option(arguments, '--chunk-size', 256)
+    except ValueError as error:
+        print(error)
+        return
+    try:
+        input_file = open(arguments[0], encoding='utf-8') if arguments else sys.stdin
+    except OSError as error:
+        print(error)
+        return
+    try:
+        patterns = read_patterns(input_file)
+        if workers == 1:
+            records = map(compile_record, patterns)
+            for record in records:
+                print(json.dumps(record, ensure_ascii=False))
+        else:
+            # patterns are sent to the workers in chunks so the IPC cost is paid once per chunk
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for record in executor.map(compile_record, patterns, chunksize=chunk_size):
+                    print(json.dumps(record, ensure_ascii=False))
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+
+# regex -> minimal DFA through the followpos construction, the NFA stages are skipped entirely
+def direct_main(user_input, match_text, profile):
+    try:
+        output = Profiler.run_stage('parse_regex', parse_regex, user_input)
+    except RegexError as error:
+        print(error)
+        return
+    dfa = compile_stage(user_input, 'direct', lambda: Profiler.run_stage('direct_dfa', compile_direct_dfa, output))
+    print_dfa(output, dfa, match_text, profile)
+
+# regex -> ε-NFA -> subset construction -> minimal DFA, both the NFA and the DFA come from the cache when possible
+def dfa_main(user_input, match_text, profile):
+    try:
+        output, automata = compile_regex(user_input)
+    except RegexError as error:
+        print(error)
+        return
+    dfa = compile_stage(user_input, 'dfa', lambda: Profiler.run_stage('compile_dfa', compile_dfa, automata))
+    print_dfa(output, dfa, match_text, profile)
+
+def print_dfa(output, dfa, match_text, profile):
+    print('Postfix: ', postfix_text(output))
+    print('DFA: {} states, {} symbol classes'.format(dfa.state_count, dfa.width))
+    if match_text is not None:
+        print('Match: {}'.format(dfa.fullmatch(match_text)))
+        if profile:
+            Profiler.match_metrics(dfa, match_text)
+
 # Main function
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'tokenize':
+        tokenize_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'scan':
+        scan_main(sys.argv[2:])
+        return
+    # usage: lexer.py REGEX [naive_validation] [--render] [--export dot|json|binary] [--output DIR] [--max-states N]
+    #                        [--profile] [--stats] [--match TEXT] [--backend nfa|dfa|direct]
+    # nothing is drawn unless --render is given, files are written inside the --output directory
+    # --profile reports every stage and the matching work, --stats the size and ε metrics of the NFA
+    # --backend dfa builds the minimal DFA from the NFA, --backend direct straight from the expression tree
+    arguments = sys.argv[1:]
+    flags = {flag: flag in arguments for flag in ('--render', '--profile', '--stats')}
+    arguments = [argument for argument in arguments if argument not in flags]
+    render = flags['--render']
+    if flags['--profile']:
+        Profiler.add_hook(Profiler.print_hook)
+    try:
+        match_text = pop_option(arguments, '--match', None, str)
+        backend = pop_option(arguments, '--backend', 'nfa', str)
+        export_format = pop_option(arguments, '--export', None, str)
+        output_directory = pop_option(arguments, '--output', '.', str)
+        max_states = pop_option(arguments, '--max-states', None)
+    except ValueError as error:
+        print(error)
+        return
     # receive inputs from command line or console input
-    user_input = sys.argv[1] if len(sys.argv) > 1 else input('Enter a regular expression: ')
+    user_input = arguments[0] if len(arguments) > 0 else input('Enter a regular expression: ')
     # user_input = '0?(1?)?0*' #Dummy input, uncomment for debugging
 
-    if len(sys.argv) > 2:
-        if sys.argv[2] == 'naive_validation':
-            is_input_valid = validate_input_naive(clean_input(user_input))
-        else:
-            is_input_valid = validate_input(user_input)
-    else:
-        is_input_valid = validate_input(user_input)
-
-
-    if is_input_valid and (len(user_input) > 0):
-        user_input = clean_input(user_input)
-        user_input = format_input(user_input)
-        output = shunting_yard(user_input)
-        print('Postfix: ',''.join(output))
-        tree = build_tree(output)
-
-        digraph = Digraph(graph_attr={'dpi': str(200)})
-        postorder_traversal_draw(tree, digraph)
-        digraph.render('expression tree', format='png')
-        automata = build_automata(output)
-        automata = embellish_automata(automata)
-        draw_automata(automata)
+    if len(arguments) > 1 and arguments[1] == 'naive_validation':
+        if not validate_input_naive(clean_input(user_input)):
+            return
+    if backend == 'direct':
+        direct_main(user_input, match_text, flags['--profile'])
+        return
+    if backend == 'dfa':
+        dfa_main(user_input, match_text, flags['--profile'])
+        return
+    if backend != 'nfa':
+        print('Unknown backend {}, expected nfa, dfa or direct'.format(backend))
+        return
+    try:
+        output, automata = compile_regex(user_input)
+    except RegexError as error:
+        print(error)
+        return
+
+    print('Postfix: ', postfix_text(output))
+    print('NFA: {} states, {} transitions'.format(len(automata.states), automata.transition_count()))
+    if flags['--stats'] or flags['--profile']:
+        for name, value in Profiler.automata_metrics(automata).items():
+            print('[stats] {}: {}'.format(name, value))
+    if match_text is not None:
+        print('Match: {}'.format(automata.fullmatch(match_text)))
+        if flags['--profile']:
+            Profiler.match_metrics(automata, match_text)
+            Profiler.match_metrics(LazyDFA(automata), match_text)
+    if not render and export_format is None:
+        return
+    tree = Profiler.run_stage('build_tree', build_tree, output)
+    os.makedirs(output_directory, exist_ok=True)
+    if export_format is not None:
+        try:
+            for path in export_files(os.path.join(output_directory, 'NFA'), export_format, automata, tree):
+                print('Exported', path)
+        except ValueError as error:
+            print(error)
+            return
+    if render:
+        queue = RenderQueue(max_states)
+        queue.add_tree(tree, os.path.join(output_directory, 'expression tree'))
+        queue.add_automata(automata, os.path.join(output_directory, 'NFA'))
+        for path in queue.render():
+            print('Rendered', path)
         print('Success!, expression tree and NFA png files generated :)')
 
 if __name__ == "__main__":
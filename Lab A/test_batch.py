@@ -0,0 +1,41 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the NumPy batch fullmatch of many strings against one compact DFA
+
+import random
+
+import pytest
+
+from DFA import compile_dfa, encode_batch
+from lexer import compile_regex
+from test_engines import random_pattern, random_text
+
+
+def test_batch_fullmatch_matches_fullmatch():
+    numpy = pytest.importorskip('numpy')
+    generator = random.Random(5)
+    for _ in range(100):
+        pattern = random_pattern(generator)
+        dfa = compile_dfa(compile_regex(pattern, cache=None)[1])
+        texts = [random_text(generator, 8) for _ in range(30)]
+        expected = [dfa.fullmatch(text) for text in texts]
+        assert dfa.fullmatch_batch(texts).tolist() == expected, pattern
+        codes = numpy.zeros((len(texts), 9), dtype=numpy.uint32)
+        for row, text in enumerate(texts):
+            codes[row, :len(text)] = [ord(character) for character in text]
+        assert dfa.fullmatch_batch(codes, [len(text) for text in texts]).tolist() == expected, pattern
+
+# numpy unicode arrays drop trailing NULs, the batch must still read them
+def test_batch_fullmatch_keeps_trailing_nuls():
+    pytest.importorskip('numpy')
+    dfa = compile_dfa(compile_regex('a[^a]', cache=None)[1])
+    texts = ['a\x00', '\x00', 'a\x00\x00', 'ab', '']
+    assert dfa.fullmatch_batch(texts).tolist() == [dfa.fullmatch(text) for text in texts] == [True, False, False, True, False]
+
+def test_encoded_batch_is_zero_padded():
+    pytest.importorskip('numpy')
+    codes, lengths = encode_batch(['ab', '', 'é\x00'])
+    assert codes.shape == (3, 2)
+    assert codes.tolist() == [[97, 98], [0, 0], [233, 0]]
+    assert list(lengths) == [2, 0, 2]
@@ -0,0 +1,66 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the compile cache and the binary formats it stores
+
+import os
+import struct
+
+from Automata import AUTOMATA_MAGIC_V1, Automata, tokens_automata
+from CompileCache import CompileCache
+from DFA import CompactDFA, compile_dfa
+from Optimizer import reduce_automata
+from RegexParser import parse_regex
+from lexer import compile_regex, compile_stage, reduced_regex
+
+TEXTS = ['', 'a', 'ab', 'abb', 'ba', 'aab', 'b']
+
+
+def test_tokenizer_automata_keep_their_rules():
+    automata = reduce_automata(tokens_automata([parse_regex('ab*'), parse_regex('a'), parse_regex('b+')]))
+    copy = Automata.from_bytes(automata.to_bytes())
+    assert automata.final_rules
+    assert copy.final_rules == automata.final_rules
+    assert sorted(copy.final_states) == sorted(automata.final_states)
+
+def test_old_automata_data_is_read_without_rules():
+    automata = compile_regex('(a|b)*abb', cache=None)[1]
+    data = automata.to_bytes()
+    # the old format had no final rules section at the end
+    old_data = AUTOMATA_MAGIC_V1 + data[4:-struct.calcsize('<I')]
+    copy = Automata.from_bytes(old_data)
+    assert copy.final_rules == {}
+    assert [copy.fullmatch(text) for text in TEXTS] == [automata.fullmatch(text) for text in TEXTS]
+
+def test_compiled_stages_survive_restarts(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    reduced = reduced_regex('a[^a]b*', cache)
+    dfa = compile_stage('a[^a]b*', 'dfa', lambda: compile_dfa(compile_regex('a[^a]b*', cache)[1]), cache)
+    assert sorted(name.rsplit('.', 1)[1] for name in os.listdir(str(tmp_path))) == ['dfa', 'nfa', 'reduced']
+    restarted = CompileCache(str(tmp_path))
+    cached_reduced = restarted.get_compiled('a[^a]b*', 'reduced')
+    cached_dfa = restarted.get_compiled('a[^a]b*', 'dfa')
+    assert restarted.disk_hits == 2 and restarted.misses == 0
+    assert isinstance(cached_dfa, CompactDFA)
+    for text in TEXTS + ['axb', 'a\nbb']:
+        assert cached_reduced.fullmatch(text) == reduced.fullmatch(text)
+        assert cached_dfa.fullmatch(text) == dfa.fullmatch(text)
+    # a hit never calls build
+    assert compile_stage('a[^a]b*', 'dfa', lambda: None, restarted) is cached_dfa
+
+def test_stages_do_not_share_entries():
+    cache = CompileCache()
+    compile_stage('ab', 'dfa', lambda: 'dfa', cache)
+    assert cache.get_compiled('ab', 'direct') is None
+    assert cache.get_compiled('ab', 'dfa') == 'dfa'
+    assert cache.get('ab') is None
+
+def test_truncated_dfa_entry_is_a_miss(tmp_path):
+    cache = CompileCache(str(tmp_path))
+    compile_stage('(a|b)*abb', 'dfa', lambda: compile_dfa(compile_regex('(a|b)*abb', cache=None)[1]), cache)
+    path = cache.path(cache.key('(a|b)*abb', 'dfa'), 'dfa')
+    with open(path, 'rb') as entry_file:
+        data = entry_file.read()
+    with open(path, 'wb') as entry_file:
+        entry_file.write(data[:-8])
+    assert CompileCache(str(tmp_path)).get_compiled('(a|b)*abb', 'dfa') is None
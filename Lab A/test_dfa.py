@@ -0,0 +1,62 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the Hopcroft minimization and the compact array-backed DFA
+
+import random
+import re
+
+import pytest
+
+from DFA import DEAD_STATE, START_STATE, CompactDFA, compile_dfa, minimize_dfa, subset_construction
+from lexer import compile_regex
+from test_engines import expected_search, random_pattern, random_text
+
+
+def test_dfa_matches_nfa():
+    generator = random.Random(23)
+    for _ in range(200):
+        pattern = random_pattern(generator)
+        expression = re.compile(pattern, re.ASCII)
+        automata = compile_regex(pattern, cache=None)[1]
+        dfa = compile_dfa(automata)
+        copy = CompactDFA.from_bytes(dfa.to_bytes())
+        for _ in range(10):
+            text = random_text(generator, 6)
+            pos = generator.randint(0, len(text))
+            for compact in (dfa, copy):
+                assert compact.fullmatch(text) == (expression.fullmatch(text) is not None), (pattern, text)
+                assert compact.match(text, pos) == automata.match(text, pos), (pattern, text, pos)
+                assert compact.search(text) == expected_search(expression, text), (pattern, text)
+
+def test_dfa_search_from_a_position():
+    dfa = compile_dfa(compile_regex('(a|b)*abb', cache=None)[1])
+    text = 'ab' * 50 + 'babb' + 'xabb'
+    assert dfa.search(text) == (0, 104)
+    assert dfa.search(text, 101) == (101, 104)
+    assert dfa.search(text, 103) == (105, 108)
+    assert dfa.search(text, 106) is None
+
+# state counts of the minimal DFAs, the dead state included
+@pytest.mark.parametrize('pattern, state_count', [
+    ('(a|b)*abb', 5), ('a*', 2), ('a|b', 3), ('(a|b)*a(a|b)(a|b)', 9), ('ab|ac', 4), ('(ab)+c?', 5),
+])
+def test_minimal_state_count(pattern, state_count):
+    automata = compile_regex(pattern, cache=None)[1]
+    dfa = compile_dfa(automata)
+    assert dfa.state_count == state_count
+    assert subset_construction(automata).state_count >= state_count
+    # minimizing a minimal DFA changes nothing
+    assert minimize_dfa(dfa).state_count == state_count
+
+def test_dead_and_start_states_keep_their_rows():
+    dfa = compile_dfa(compile_regex('ab', cache=None)[1])
+    assert not dfa.is_final(DEAD_STATE) and not dfa.is_final(START_STATE)
+    assert all(dfa.next_state(DEAD_STATE, character) == DEAD_STATE for character in 'abx')
+    assert dfa.next_state(START_STATE, 'b') == DEAD_STATE
+    assert dfa.next_state(START_STATE, 'a') != DEAD_STATE
+
+def test_truncated_bytes_are_rejected():
+    data = compile_dfa(compile_regex('(a|b)*abb', cache=None)[1]).to_bytes()
+    with pytest.raises(ValueError):
+        CompactDFA.from_bytes(data[:-8])
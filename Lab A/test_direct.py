@@ -0,0 +1,43 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the direct regex -> DFA construction
+
+import random
+
+from DFA import compile_dfa
+from DirectDFA import EMPTY_POSITIONS, compile_direct_dfa, followpos_table, positions_of, union_positions
+from ExpressionTree import build_tree
+from RegexParser import parse_regex
+from lexer import compile_regex
+from test_engines import random_pattern, random_text
+
+
+# both constructions end in the minimal DFA, so they agree on the number of states and on every text
+def test_direct_dfa_is_the_minimal_dfa():
+    generator = random.Random(17)
+    for _ in range(200):
+        pattern = random_pattern(generator)
+        postfix, automata = compile_regex(pattern, cache=None)
+        direct = compile_direct_dfa(postfix)
+        dfa = compile_dfa(automata)
+        assert direct.state_count == dfa.state_count, pattern
+        for _ in range(10):
+            text = random_text(generator, 6)
+            assert direct.fullmatch(text) == dfa.fullmatch(text), (pattern, text)
+
+def test_position_sets_are_canonical():
+    assert union_positions((5, 0b101), (3, 0b1)) == (3, 0b10101)
+    assert union_positions(EMPTY_POSITIONS, (7, 1)) == (7, 1)
+    assert positions_of((3, 0b10101)) == [3, 5, 7]
+
+# position sets only span the positions they hold, so a long concatenation keeps one bit wide followpos sets
+def test_long_concatenation_stays_compact():
+    pattern = ''.join('abcdefgh'[i % 8] for i in range(20000))
+    postfix = parse_regex(pattern)
+    symbols, followpos, start_positions = followpos_table(build_tree(postfix))
+    assert start_positions == (0, 1)
+    assert all(bits == 1 for _, bits in followpos[:-1])
+    dfa = compile_direct_dfa(postfix)
+    assert dfa.state_count == len(pattern) + 2
+    assert dfa.fullmatch(pattern) and not dfa.fullmatch(pattern[:-1])
@@ -0,0 +1,69 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for every matching engine against Python's re on patterns with character classes and escapes
+
+import random
+import re
+
+from Automata import Automata
+from DFA import CompactDFA, LazyDFA, compile_dfa
+from DirectDFA import compile_direct_dfa
+from Optimizer import reduce_automata
+from lexer import compile_regex
+
+# operands of the random patterns, every escape and class form the parser knows
+ATOMS = [
+    'a', 'b', 'c', '1', '-', '_', '.', r'\d', r'\w', r'\s', r'\D', r'\W', r'\S', r'\.', r'\|', r'\*', r'\(', r'\\',
+    '[a-c]', '[^a]', '[ab1]', '[a-z0-9]', '[^\\d\\s]', '[-a]', '[a-]', '[\\]x]', '[ ]', '[\\-b]', '[^-]', '[c]', '[|]',
+    r'\n', '[\\w.]',
+]
+ALPHABET = 'abcxz19_-. |*()\\]\n\tAé'
+
+
+def random_pattern(generator, depth=0):
+    roll = generator.random()
+    if depth > 3 or roll < 0.35:
+        return generator.choice(ATOMS)
+    if roll < 0.55:
+        return random_pattern(generator, depth + 1) + random_pattern(generator, depth + 1)
+    if roll < 0.7:
+        return '(' + random_pattern(generator, depth + 1) + '|' + random_pattern(generator, depth + 1) + ')'
+    return '(' + random_pattern(generator, depth + 1) + ')' + generator.choice('*+?')
+
+def random_text(generator, length):
+    return ''.join(generator.choice(ALPHABET) for _ in range(generator.randint(0, length)))
+
+# every engine built from one pattern, all of them must agree with re
+def engines(pattern):
+    postfix, automata = compile_regex(pattern, cache=None)
+    dfa = compile_dfa(automata)
+    return {
+        'nfa': automata,
+        'lazy': LazyDFA(automata, cache_size=8),
+        'dfa': dfa,
+        'dfa bytes': CompactDFA.from_bytes(dfa.to_bytes()),
+        'direct': compile_direct_dfa(postfix),
+        'reduced': reduce_automata(automata),
+        'nfa bytes': Automata.from_bytes(automata.to_bytes()),
+    }
+
+# leftmost start, longest end, like Automata.search
+def expected_search(expression, text):
+    for start in range(len(text) + 1):
+        ends = [end for end in range(start, len(text) + 1) if expression.fullmatch(text, start, end)]
+        if ends:
+            return (start, max(ends))
+    return None
+
+def test_engines_match_re():
+    generator = random.Random(7)
+    for _ in range(300):
+        pattern = random_pattern(generator)
+        expression = re.compile(pattern, re.ASCII)
+        built = engines(pattern)
+        for _ in range(20):
+            text = random_text(generator, 6)
+            expected = expression.fullmatch(text) is not None
+            for name, engine in built.items():
+                assert engine.fullmatch(text) == expected, (name, pattern, text)
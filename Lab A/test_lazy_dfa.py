@@ -0,0 +1,59 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the lazy DFA, its bounded state cache and its fallback to NFA simulation
+
+import random
+import re
+
+from DFA import LazyDFA
+from lexer import compile_regex
+from test_engines import expected_search, random_pattern, random_text
+
+
+def test_lazy_dfa_matches_nfa():
+    generator = random.Random(19)
+    for _ in range(200):
+        pattern = random_pattern(generator)
+        expression = re.compile(pattern, re.ASCII)
+        automata = compile_regex(pattern, cache=None)[1]
+        lazy = LazyDFA(automata, cache_size=4)
+        for _ in range(10):
+            text = random_text(generator, 6)
+            pos = generator.randint(0, len(text))
+            assert lazy.fullmatch(text) == (expression.fullmatch(text) is not None), (pattern, text)
+            assert lazy.match(text, pos) == automata.match(text, pos), (pattern, text, pos)
+            assert lazy.search(text) == expected_search(expression, text), (pattern, text)
+
+def test_lazy_search_from_a_position():
+    lazy = LazyDFA(compile_regex('(a|b)*abb', cache=None)[1])
+    text = 'ab' * 50 + 'babb' + 'xabb'
+    assert lazy.search(text) == (0, 104)
+    assert lazy.search(text, 101) == (101, 104)
+    assert lazy.search(text, 103) == (105, 108)
+    assert lazy.search(text, 106) is None
+
+def test_cache_is_bounded():
+    lazy = LazyDFA(compile_regex('(a|b)*a(a|b)(a|b)', cache=None)[1], cache_size=3)
+    for text in ('abab', 'bbba', 'aaaa', 'abba'):
+        lazy.fullmatch(text)
+    stats = lazy.stats()
+    assert stats['states'] <= 3 and stats['evictions'] > 0
+    lazy.reset_stats()
+    assert lazy.stats()['misses'] == lazy.stats()['evictions'] == 0
+    # a large enough cache reads the same text again without building a state
+    lazy = LazyDFA(compile_regex('(a|b)*abb', cache=None)[1])
+    lazy.fullmatch('abababb')
+    lazy.reset_stats()
+    assert lazy.fullmatch('abababb') and lazy.stats()['misses'] == 0
+
+# a cache smaller than the DFA thrashes, search then finishes on the NFA with the same result
+def test_search_falls_back_to_nfa_when_the_cache_thrashes():
+    generator = random.Random(13)
+    automata = compile_regex('(a|b)*a(a|b)(a|b)(a|b)(a|b)c', cache=None)[1]
+    text = ''.join(generator.choice('ab') for _ in range(300)) + 'c'
+    lazy = LazyDFA(automata, cache_size=2)
+    assert lazy.search(text) == automata.search(text) == expected_search(re.compile('(a|b)*a(a|b)(a|b)(a|b)(a|b)c'), text)
+    assert lazy.stats()['fallbacks'] == 1
+    lazy.reset_stats()
+    assert lazy.fullmatch(text) and lazy.stats()['fallbacks'] == 1
@@ -0,0 +1,46 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the Thompson simulation of Automata (match, fullmatch and search) against Python's re
+
+import random
+import re
+
+from lexer import compile_regex
+from test_engines import expected_search, random_pattern, random_text
+
+
+# the longest prefix of text[pos:] that re matches
+def expected_match(expression, text, pos):
+    ends = [end for end in range(pos, len(text) + 1) if expression.fullmatch(text, pos, end)]
+    return max(ends) if ends else None
+
+def test_nfa_matches_re():
+    generator = random.Random(17)
+    for _ in range(200):
+        pattern = random_pattern(generator)
+        expression = re.compile(pattern, re.ASCII)
+        automata = compile_regex(pattern, cache=None)[1]
+        for _ in range(10):
+            text = random_text(generator, 6)
+            pos = generator.randint(0, len(text))
+            assert automata.fullmatch(text) == (expression.fullmatch(text) is not None), (pattern, text)
+            assert automata.match(text, pos) == expected_match(expression, text, pos), (pattern, text, pos)
+            assert automata.search(text) == expected_search(expression, text), (pattern, text)
+
+def test_nfa_search_from_a_position():
+    automata = compile_regex('(a|b)*abb', cache=None)[1]
+    text = 'ab' * 50 + 'babb' + 'xabb'
+    assert automata.search(text) == (0, 104)
+    assert automata.search(text, 101) == (101, 104)
+    assert automata.search(text, 103) == (105, 108)
+    assert automata.search(text, 106) is None
+
+# closures are computed once per state and reused by every later step
+def test_epsilon_closures_are_cached():
+    automata = compile_regex('(a|b)*abb', cache=None)[1]
+    assert automata.fullmatch('ababb')
+    closures = dict(automata.closures)
+    assert closures
+    assert automata.fullmatch('babb' * 10)
+    assert all(automata.closures[state] is closure for state, closure in closures.items())
@@ -0,0 +1,54 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the ε-elimination and NFA state-reduction passes
+
+import random
+import re
+
+from Automata import tokens_automata
+from Optimizer import accepted_rule, eliminate_epsilon, reduce_automata
+from RegexParser import parse_regex
+from lexer import compile_regex
+from test_engines import random_pattern, random_text
+
+
+# rule accepted by automata after reading text, None when text is rejected
+def rule_of(automata, text):
+    states = automata.epsilon_closure(automata.initial_state)
+    for character in text:
+        states = automata.step(states, character)
+    return accepted_rule(automata, [state for state in states if state in automata.final_states])
+
+def test_reduced_automata_match_re():
+    generator = random.Random(29)
+    for _ in range(200):
+        pattern = random_pattern(generator)
+        expression = re.compile(pattern, re.ASCII)
+        automata = compile_regex(pattern, cache=None)[1]
+        reduced = reduce_automata(automata)
+        eliminated = eliminate_epsilon(automata)
+        assert not eliminated.epsilon, pattern
+        assert len(reduced.states) <= len(automata.states), pattern
+        for _ in range(10):
+            text = random_text(generator, 6)
+            expected = expression.fullmatch(text) is not None
+            assert reduced.fullmatch(text) == eliminated.fullmatch(text) == expected, (pattern, text)
+
+def test_reduction_keeps_the_rule_priority():
+    automata = tokens_automata([parse_regex('ab*'), parse_regex('a'), parse_regex('b+'), parse_regex('(a|b)*c')])
+    reduced = reduce_automata(automata)
+    for text in ('a', 'ab', 'abb', 'b', 'bb', 'c', 'abc', 'ba', ''):
+        assert rule_of(reduced, text) == rule_of(automata, text), text
+
+def test_equivalent_states_are_merged():
+    reduced = reduce_automata(compile_regex('(a|b)*abb', cache=None)[1])
+    assert len(reduced.states) == 4 and not reduced.epsilon
+
+# a starred alternation of many words has a closure shared by every state, removing its ε-edges is quadratic
+def test_elimination_stops_at_its_budget():
+    automata = compile_regex('(' + '|'.join('w%d' % word for word in range(300)) + ')*', cache=None)[1]
+    assert eliminate_epsilon(automata, max_work=1000) is None
+    reduced = reduce_automata(automata, max_growth=1)
+    assert reduced.epsilon
+    assert reduced.fullmatch('w1w299w17') and not reduced.fullmatch('w1w')
@@ -0,0 +1,106 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the single pass front-end against the legacy clean/validate/format/shunting yard route
+
+import contextlib
+import io
+import random
+
+import pytest
+
+from lexer import clean_input, validate_input, format_input, shunting_yard
+from CharClass import CharSet, label_ranges
+from RegexParser import RegexError, parse_regex
+
+
+def legacy_postfix(user_input):
+    # the legacy validator prints its errors, returns None when it rejects the input
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not validate_input(user_input):
+            return None
+    return shunting_yard(format_input(clean_input(user_input)))
+
+def parse_or_none(user_input):
+    try:
+        return parse_regex(user_input)
+    except RegexError:
+        return None
+
+@pytest.mark.parametrize('user_input', [
+    'a|b', 'ab', 'a*', 'a+', 'a?', '(a|b)*abb', '0?(1?)?0*', '(ab)+c?', 'a+b+', '((a|b)+)?c*', 'x(y|z)*w+', '(a|ε)b',
+    ' a b | c ', '((a))', 'a**', '(a|b)(c|d)',
+])
+def test_postfix_matches_legacy_route(user_input):
+    assert parse_regex(user_input) == legacy_postfix(user_input)
+
+# every input the parser accepts gets the postfix of the legacy route, which also accepts it.
+# The legacy validator accepts a few broken inputs (like a|?) that the parser rejects
+def test_random_inputs_match_legacy_route():
+    generator = random.Random(3)
+    accepted = 0
+    for _ in range(20000):
+        user_input = ''.join(generator.choice('ab()|*+? ') for _ in range(generator.randint(0, 9)))
+        postfix = parse_or_none(user_input)
+        if postfix is not None:
+            assert postfix == legacy_postfix(user_input), user_input
+            accepted += 1
+    assert accepted > 1000
+
+@pytest.mark.parametrize('user_input, message, position', [
+    ('', 'Empty input', None),
+    ('*a', 'Symbols at start are not a valid operation', 0),
+    ('a|', 'Symbol at end not valid', 1),
+    ('a||b', 'Two or more consecutive |', 2),
+    ('(|a)', 'Operators after open parenthesis are not a valid operation', 1),
+    ('a)', 'Mismatched parenthesis, cannot close a parenthesis that was not opened', 1),
+    ('(a', 'Parenthesis mismatch error, close all parenthesis to fix it', 0),
+    ('()', 'Empty parenthesis', 1),
+    ('[abc', 'Character class not closed', 0),
+    ('[]', 'Empty character class', 0),
+    ('[z-a]', 'Invalid range z-a', 1),
+    ('a\\', 'Escape at end of input', 1),
+    ('a\\x4', 'Expected 2 hexadecimal digits after \\x', 1),
+    ('[\\u12g4]', 'Expected 4 hexadecimal digits after \\u', 1),
+    ('\\U00110000', 'Codepoint out of range \\U00110000', 0),
+])
+def test_errors(user_input, message, position):
+    with pytest.raises(RegexError) as error:
+        parse_regex(user_input)
+    assert error.value.message == message
+    assert error.value.position == position
+
+def test_character_classes_are_single_operands():
+    postfix = parse_regex('[a-z0-9]+')
+    assert len(postfix) == 2 and postfix[1] == '+'
+    assert 'q' in postfix[0] and '5' in postfix[0] and 'Q' not in postfix[0]
+    negated = parse_regex('[^a]')[0]
+    assert 'a' not in negated and 'b' in negated and '\n' in negated
+
+def test_escaped_operators_are_literals():
+    postfix = parse_regex('a\\|b')
+    assert postfix[1] != '|' and '|' in postfix[1]
+    # one character classes of plain characters stay plain characters
+    assert parse_regex('[a]') == ['a']
+
+def test_codepoint_escapes():
+    assert parse_regex('\\x41\\u00e9') == ['A', 'é', '.']
+    assert parse_regex('\\U0001f600') == ['\U0001f600']
+    assert label_ranges(parse_regex('[\\x00-\\x1f]')[0]) == ((0, 31),)
+
+# the printed form of a set is parsed back as the same set
+def test_printed_sets_parse_back():
+    codepoints = [0, 1, 9, 10, 31, 32, 45, 46, 48, 65, 92, 93, 94, 97, 100, 117, 120, 124, 0x85, 0xff, 0x100, 0x3b5,
+                  0x2028, 0xffff, 0x10000, 0x10ffff]
+    generator = random.Random(9)
+    for _ in range(3000):
+        ranges = []
+        for _ in range(generator.randint(1, 3)):
+            low = generator.choice(codepoints)
+            ranges.append((low, generator.choice([low] + [code for code in codepoints if code > low])))
+        char_set = CharSet(ranges)
+        for printed in (char_set, char_set.negate()):
+            if not printed.ranges:
+                continue
+            postfix = parse_regex(str(printed))
+            assert len(postfix) == 1 and label_ranges(postfix[0]) == printed.ranges, str(printed)
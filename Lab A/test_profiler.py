@@ -0,0 +1,31 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the pipeline instrumentation
+
+import Profiler
+from DFA import compile_dfa
+from lexer import compile_regex
+
+
+def test_output_size_of_every_stage_result():
+    postfix, automata = compile_regex('(a|b)*abb', cache=None)
+    dfa = compile_dfa(automata)
+    assert Profiler.output_size(dfa) == dfa.state_count
+    assert Profiler.output_size((postfix, automata)) == len(automata.states)
+    assert Profiler.output_size(postfix) == len(postfix)
+    assert Profiler.output_size(None) == 0
+
+def test_stage_events_report_dfa_sizes():
+    events = []
+    hook = lambda event, data: events.append((event, data))
+    Profiler.add_hook(hook)
+    try:
+        dfa = Profiler.run_stage('compile_dfa', compile_dfa, compile_regex('(a|b)*abb', cache=None)[1])
+        metrics = Profiler.match_metrics(dfa, 'ababb')
+    finally:
+        Profiler.remove_hook(hook)
+    stages = {data['stage']: data for event, data in events if event == 'stage'}
+    assert stages['compile_dfa']['output_size'] == dfa.state_count
+    assert metrics['matched'] and metrics['characters_scanned'] == 5
+    assert not Profiler.match_metrics(dfa, 'abc')['matched']
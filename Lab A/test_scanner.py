@@ -0,0 +1,83 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the streaming scanner, its chunk buffer and the chunked tokenizer
+
+import io
+import mmap
+
+from RegexParser import parse_regex
+from Scanner import ChunkBuffer, open_mapped, read_chunks, scan_matches
+from Tokenizer import Tokenizer
+from lexer import batch_main, compile_regex, scan_main, tokenize_main
+
+TEXT = 'let é = 12; café_2 = é + 345;'
+RULES = [('ID', '[a-zé_][a-zé_0-9]*'), ('NUM', '\\d+'), ('OP', '[=+;]')]
+
+
+def pieces(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+def tokens(tokenizer, chunks):
+    return [tuple(token) for token in tokenizer.tokenize_chunks(chunks)]
+
+def test_split_multibyte_characters_are_decoded_whole():
+    data = TEXT.encode('utf-8')
+    for size in (1, 2, 3, 5):
+        chunks = list(read_chunks(pieces(data, size)))
+        assert ''.join(chunks) == TEXT
+        assert all(chunks)
+    assert ''.join(read_chunks(io.BytesIO(data), chunk_size=1)) == TEXT
+    assert ''.join(read_chunks(io.StringIO(TEXT), chunk_size=4)) == TEXT
+
+def test_chunk_buffer_reads_across_chunks():
+    buffer = ChunkBuffer(['ab', 'cd', 'e'])
+    assert buffer.has(3) and buffer.char(3) == 'd'
+    assert buffer.slice(1, 4) == 'bcd'
+    buffer.release(3)
+    assert buffer.has(4) and buffer.slice(3, 5) == 'de'
+    # released text is dropped on the next load, what is kept is still addressed by absolute positions
+    assert buffer.offset == 3 and buffer.text == 'de'
+    assert not buffer.has(5)
+
+def test_scan_finds_matches_split_between_chunks():
+    automata = compile_regex('ab+', cache=None)[1]
+    expected = [(1, 5, 'abbb'), (6, 8, 'ab'), (9, 13, 'abbb')]
+    for size in (1, 2, 3, 100):
+        assert list(scan_matches(automata, pieces('xabbbyabzabbb', size))) == expected
+
+def test_tokens_split_between_chunks():
+    tokenizer = Tokenizer([(name, parse_regex(regex)) for name, regex in RULES], ignore=' ')
+    expected = tokens(tokenizer, [TEXT])
+    assert ('ID', 'café_2', 12) in expected
+    data = TEXT.encode('utf-8')
+    for size in (1, 2, 3, 7):
+        assert tokens(tokenizer, read_chunks(pieces(data, size))) == expected
+
+def test_mapped_file(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_bytes(TEXT.encode('utf-8'))
+    with open_mapped(str(path)) as input_file:
+        assert isinstance(input_file, mmap.mmap)
+        assert ''.join(read_chunks(input_file, chunk_size=3)) == TEXT
+    tokenizer = Tokenizer([(name, parse_regex(regex)) for name, regex in RULES], ignore=' ')
+    with open_mapped(str(path)) as input_file:
+        assert tokens(tokenizer, read_chunks(input_file, chunk_size=2)) == tokens(tokenizer, [TEXT])
+
+def test_empty_file_is_not_mapped(tmp_path):
+    path = tmp_path / 'empty.txt'
+    path.write_bytes(b'')
+    with open_mapped(str(path)) as input_file:
+        assert not isinstance(input_file, mmap.mmap)
+        assert list(read_chunks(input_file)) == []
+
+def test_missing_file_is_reported(tmp_path, capsys):
+    rules = tmp_path / 'rules.txt'
+    rules.write_text('A a\n', encoding='utf-8')
+    for run, arguments in ((scan_main, ['ab']), (tokenize_main, [str(rules)]), (tokenize_main, [])):
+        run(arguments + [str(tmp_path / 'missing.txt')])
+        assert 'No such file or directory' in capsys.readouterr().out
+
+def test_missing_batch_file_is_reported(tmp_path, capsys):
+    batch_main([str(tmp_path / 'missing.txt'), '--workers', '1'])
+    assert 'No such file or directory' in capsys.readouterr().out
@@ -0,0 +1,50 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the Thompson construction, its state numbering and its linear size
+
+import pytest
+
+from Automata import build_automata, embellish_automata
+from lexer import clean_input, compile_regex, format_input, shunting_yard
+
+
+# states, transitions and finals of the legacy route, the numbering the drawings and exports rely on
+@pytest.mark.parametrize('user_input, postfix, transitions, final_states', [
+    ('a|b', 'ab|', ["((0, 'ε'), 1)", "((0, 'ε'), 2)", "((1, 'b'), 4)", "((2, 'a'), 3)", "((3, 'ε'), 5)", "((4, 'ε'), 5)"], [5]),
+    ('ab', 'ab.', ["((0, 'a'), 1)", "((1, 'b'), 2)"], [2]),
+    ('a*', 'a*', ["((0, 'ε'), 1)", "((0, 'ε'), 3)", "((1, 'a'), 2)", "((2, 'ε'), 1)", "((2, 'ε'), 3)"], [3]),
+    ('a+', 'a+', ["((0, 'a'), 1)", "((1, 'ε'), 0)", "((1, 'ε'), 2)"], [2]),
+    ('a?', 'a?', ["((0, 'ε'), 1)", "((0, 'ε'), 2)", "((1, 'ε'), 4)", "((2, 'a'), 3)", "((3, 'ε'), 5)", "((4, 'ε'), 5)"], [5]),
+    ('(a|b)*abb', 'ab|*a.b.b.', ["((0, 'ε'), 2)", "((0, 'ε'), 7)", "((1, 'b'), 4)", "((2, 'ε'), 1)", "((2, 'ε'), 5)",
+                                "((3, 'ε'), 6)", "((4, 'ε'), 6)", "((5, 'a'), 3)", "((6, 'ε'), 2)", "((6, 'ε'), 7)",
+                                "((7, 'a'), 8)", "((8, 'b'), 9)", "((9, 'b'), 10)"], [10]),
+    ('(ab)+c?', 'ab.+c?.', ["((0, 'a'), 1)", "((1, 'b'), 2)", "((2, 'ε'), 0)", "((2, 'ε'), 5)", "((3, 'c'), 6)",
+                            "((4, 'ε'), 7)", "((5, 'ε'), 3)", "((5, 'ε'), 4)", "((6, 'ε'), 8)", "((7, 'ε'), 8)"], [8]),
+    ('(a|ε)b', 'aε|b.', ["((0, 'ε'), 1)", "((0, 'ε'), 2)", "((1, 'ε'), 4)", "((2, 'a'), 3)", "((3, 'ε'), 5)",
+                         "((4, 'ε'), 5)", "((5, 'b'), 6)"], [6]),
+])
+def test_thompson_construction_shape(user_input, postfix, transitions, final_states):
+    legacy_postfix = shunting_yard(format_input(clean_input(user_input)))
+    automata = embellish_automata(build_automata(legacy_postfix))
+    assert ''.join(legacy_postfix) == postfix
+    assert sorted(map(str, automata.transitions)) == transitions
+    assert automata.initial_state == 0
+    assert automata.final_states == final_states
+    assert sorted(automata.states) == list(range(final_states[-1] + 1))
+
+# every operator adds a fixed number of states and edges, repeating a pattern n times grows the automata n times
+@pytest.mark.parametrize('pattern, states, transitions', [
+    ('(a|b)*', 7, 10), ('a?b+', 7, 9), ('(ab|c)*d', 9, 12),
+])
+def test_automata_size_is_linear(pattern, states, transitions):
+    for count in (1, 10, 100):
+        automata = compile_regex(pattern * count, cache=None)[1]
+        assert len(automata.states) == states * count + 1
+        assert automata.transition_count() == transitions * count
+
+# long inputs are built without recursion
+def test_long_pattern_is_built():
+    automata = compile_regex('(a|b)*c' * 20000, cache=None)[1]
+    assert len(automata.states) == 8 * 20000 + 1
+    assert automata.fullmatch('abc' * 20000) and not automata.fullmatch('ab' * 20000)
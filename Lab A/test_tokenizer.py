@@ -0,0 +1,49 @@
+# Created by: José Hurtarte
+# Created on: 15/03/2023
+# Last modified on: 15/03/2023
+# Description: Tests for the tokenizer and its ignored characters
+
+import pytest
+
+from CharClass import SPACE
+from RegexParser import parse_regex
+from Tokenizer import TokenizeError, Tokenizer
+from lexer import ignore_set
+
+RULES = [('ID', '[a-z]+'), ('WS', '\\s+'), ('NUM', '\\d+')]
+
+
+def tokens(text, ignore):
+    tokenizer = Tokenizer([(name, parse_regex(regex)) for name, regex in RULES], ignore=ignore)
+    return [(token.name, token.value, token.start) for token in tokenizer.tokenize(text)]
+
+def test_ignored_characters_are_skipped():
+    assert tokens('ab 12\tc', SPACE) == [('ID', 'ab', 0), ('NUM', '12', 3), ('ID', 'c', 6)]
+    assert tokens('ab 12\tc', ' \t') == [('ID', 'ab', 0), ('NUM', '12', 3), ('ID', 'c', 6)]
+
+def test_whitespace_rule_fires_when_nothing_is_ignored():
+    assert tokens('ab 12\n', ignore_set('')) == [('ID', 'ab', 0), ('WS', ' ', 2), ('NUM', '12', 3), ('WS', '\n', 5)]
+    assert tokens('ab \t1', ignore_set(' ')) == [('ID', 'ab', 0), ('WS', '\t', 3), ('NUM', '1', 4)]
+    assert tokens('ab \t1', ignore_set('[ ]')) == [('ID', 'ab', 0), ('WS', '\t', 3), ('NUM', '1', 4)]
+
+def test_ignore_option_takes_one_operand():
+    assert ignore_set('\\s') == SPACE
+    assert ignore_set('x') == 'x'
+    assert ignore_set(' ') == ' '
+    assert ignore_set('.') == '.'
+    with pytest.raises(ValueError):
+        ignore_set('ab')
+
+def test_unknown_character_is_an_error():
+    with pytest.raises(TokenizeError):
+        tokens('ab?', SPACE)
+
+# with a cache smaller than the DFA the stream falls back to NFA simulation and the memo of rules stays bounded
+def test_thrashing_stream_falls_back_to_nfa():
+    rules = [('LONG', parse_regex('(a|b)*a(a|b)(a|b)(a|b)')), ('A', parse_regex('a')), ('B', parse_regex('b'))]
+    text = 'abbabaabbbaabab' * 20
+    expected = [tuple(token) for token in Tokenizer(rules).tokenize(text)]
+    tokenizer = Tokenizer(rules, cache_size=2)
+    assert [tuple(token) for token in tokenizer.tokenize(text)] == expected
+    assert tokenizer.dfa.stats()['fallbacks'] == 1
+    assert len(tokenizer.accepted_rules) <= 2